@@ -1,3 +1,13 @@
 """Pacote principal do Leitor de Atestados."""
 
-from .app import app, create_app  # noqa: F401
+from .app import create_app, get_app  # noqa: F401
+
+# Importar o submódulo define o atributo `app` do pacote como o módulo; ele é
+# removido para que `pacote.app` seja a aplicação, criada no primeiro acesso
+del app
+
+
+def __getattr__(name):
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,24 +1,38 @@
-from flask import Flask, request, render_template_string
+from flask import Flask, Request, Response, current_app, jsonify, request, render_template_string, url_for
 import sys
 import os
 
 # Ajusta imports para funcionar tanto como módulo quanto como script
 try:
     # Tenta import relativo (quando importado como módulo)
-    from .services.upload_service import UploadService
+    from .services.upload_service import UploadService, UploadTooLargeError
     from .services.ocr_service import OCRService
-    from .services.nlp_service import NLPService
-    from .services.excel_service import ExcelService
+    from .services.ocr_cache import OCRCache
+    from .services.image_preprocessing import ImagePreprocessor
+    from .services.excel_partitions import PartitionedExcelService
+    from .services.excel_service import BufferedExcelWriter, ExcelService
+    from .services.extraction_engine import ExtractionEngine, set_engine
+    from .services.job_service import JobService, QueueFullError
+    from .services.metrics_service import REQUESTS_TOTAL, registry as metrics_registry
+    from .services.processing_service import CertificateProcessor, EmptyTextError
+    from .services.result_store import ProcessedResultStore
 except ImportError:
     # Se falhar, usa imports absolutos (quando executado como script)
     # Adiciona o diretório atual ao path
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
-    from services.upload_service import UploadService
+    from services.upload_service import UploadService, UploadTooLargeError
     from services.ocr_service import OCRService
-    from services.nlp_service import NLPService
-    from services.excel_service import ExcelService
+    from services.ocr_cache import OCRCache
+    from services.image_preprocessing import ImagePreprocessor
+    from services.excel_partitions import PartitionedExcelService
+    from services.excel_service import BufferedExcelWriter, ExcelService
+    from services.extraction_engine import ExtractionEngine, set_engine
+    from services.job_service import JobService, QueueFullError
+    from services.metrics_service import REQUESTS_TOTAL, registry as metrics_registry
+    from services.processing_service import CertificateProcessor, EmptyTextError
+    from services.result_store import ProcessedResultStore
 
 
 HTML_PAGE = """
@@ -203,15 +217,188 @@ HTML_PAGE = """
 """
 
 
-def create_app():
+DEFAULT_CONFIG = {
+    # Carrega o modelo BERT em segundo plano: o servidor atende requisições
+    # (com os padrões inteligentes) enquanto o modelo ainda está carregando
+    "MODEL_BACKGROUND_LOAD": True,
+    # Backend de inferência do BERT: "pytorch" (modelo original) ou "onnx"
+    # (modelo quantizado em int8, gerado com `python onnx_model.py export`)
+    "MODEL_BACKEND": "pytorch",
+    # Pasta do modelo ONNX quantizado (None: models/bert-onnx-int8)
+    "MODEL_ONNX_PATH": None,
+    # Resultados da IA guardados em memória por texto do OCR (0 desativa)
+    "AI_RESULT_CACHE_SIZE": 256,
+    # Registros por página em GET /certificates (padrão e máximo)
+    "CERTIFICATES_PER_PAGE": 50,
+    "CERTIFICATES_MAX_PER_PAGE": 500,
+    # Threads que processam os jobs assíncronos de /jobs
+    "JOB_WORKERS": 2,
+    # Máximo de jobs na fila ou em execução antes de recusar novos envios
+    "JOB_MAX_PENDING": 32,
+    # Segundos que o resultado de um job concluído fica disponível
+    "JOB_RESULT_TTL": 3600,
+    # Tamanho máximo do cache de OCR em disco (bytes); 0 desativa o cache
+    "OCR_CACHE_MAX_BYTES": 200 * 1024 * 1024,
+    # Linhas acumuladas antes de gravar a planilha; 0 grava a cada atestado
+    "EXCEL_BATCH_SIZE": 50,
+    # Intervalo máximo (segundos) entre gravações da planilha
+    "EXCEL_FLUSH_INTERVAL": 2.0,
+    # Divisão da planilha: None (tudo em atestados.xlsx), "month" (uma por
+    # mês) ou "rows" (uma a cada EXCEL_PARTITION_ROWS linhas), em atestados/
+    "EXCEL_PARTITIONING": None,
+    # Pasta das planilhas particionadas e do catálogo (catalog.json)
+    "EXCEL_PARTITION_DIR": "atestados",
+    "EXCEL_PARTITION_ROWS": 5000,
+    # Mês da partição: "emission" (data de emissão) ou "processing" (data atual)
+    "EXCEL_PARTITION_DATE": "emission",
+    # Arquivos lidos pelo OCR ao mesmo tempo em /batch
+    "BATCH_WORKERS": 4,
+    # Máximo de arquivos aceitos em um único envio para /batch
+    "BATCH_MAX_FILES": 50,
+    # Pré-processamento das imagens antes do OCR (fotos grandes de celular)
+    "OCR_PREPROCESS": True,
+    # DPI efetivo da página (A4) após reduzir a imagem; None mantém o tamanho.
+    # Com 300, uma foto de 4000x3000 quase não é reduzida (0,88x)
+    "OCR_TARGET_DPI": 200,
+    # Lê todas as páginas dos PDFs, mesmo quando todos os campos já foram
+    # encontrados nas primeiras
+    "OCR_FORCE_FULL": False,
+    # Backend do Tesseract: "tesserocr" (em processo, idioma carregado uma vez),
+    # "pytesseract" (um processo por imagem) ou "auto" (tesserocr se instalado)
+    "OCR_BACKEND": "auto",
+    # OCR adaptativo: leitura rápida em DPI baixo e releitura em DPI alto só
+    # das páginas com baixa confiança ou quando faltam campos
+    "OCR_ADAPTIVE": False,
+    "OCR_FAST_DPI": 150,
+    # Confiança média mínima (0-100) das palavras na leitura rápida
+    "OCR_MIN_CONFIDENCE": 70,
+    # Lê diretamente a camada de texto das páginas de PDFs digitais (sem OCR)
+    "OCR_TEXT_LAYER": True,
+    # Mínimo de letras e dígitos para considerar a camada de texto da página
+    "OCR_TEXT_LAYER_MIN_CHARS": 40,
+    # Tamanho máximo de cada arquivo enviado (bytes)
+    "UPLOAD_MAX_BYTES": 20 * 1024 * 1024,
+    # Folga por arquivo no corpo da requisição (cabeçalhos e limites do multipart)
+    "UPLOAD_OVERHEAD_BYTES": 64 * 1024,
+}
+
+
+class UploadRequest(Request):
+    """Requisição com limite de corpo maior apenas para o envio em lote (/batch)."""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == "process_batch" and current_app:
+            return current_app.config["BATCH_MAX_CONTENT_LENGTH"]
+        return super().max_content_length
+
+
+def build_status_message(found_count, reused=False, buffered=False):
+    """
+    Mensagem exibida após processar um atestado.
+
+    Com `buffered`, a linha ainda está na fila de gravação da planilha
+    (EXCEL_BATCH_SIZE) e só é gravada no próximo lote.
+    """
+
+    if reused:
+        return (
+            "Este atestado já havia sido enviado. Exibindo o resultado do primeiro processamento; "
+            "nenhuma linha nova foi adicionada à planilha."
+        )
+    if found_count > 0:
+        saved = (
+            "Os dados serão gravados na planilha em instantes."
+            if buffered
+            else "Os dados foram salvos na planilha."
+        )
+        return f"Atestado processado com sucesso! {found_count} campo(s) encontrado(s). {saved}"
+    return "Atestado processado, mas nenhum campo foi encontrado. Verifique se a imagem está legível."
+
+
+def create_app(config=None):
     """Aplicação Flask configurada com os serviços necessários."""
 
     app = Flask(__name__)
-
-    upload_service = UploadService()
-    ocr_service = OCRService()
-    nlp_service = NLPService()
-    excel_service = ExcelService()
+    app.request_class = UploadRequest
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    # Limite do corpo da requisição: um arquivo nas rotas comuns e o lote
+    # inteiro, no pior caso, só em /batch
+    upload_body_bytes = app.config["UPLOAD_MAX_BYTES"] + app.config["UPLOAD_OVERHEAD_BYTES"]
+    if app.config.get("MAX_CONTENT_LENGTH") is None:
+        app.config["MAX_CONTENT_LENGTH"] = upload_body_bytes
+    app.config.setdefault("BATCH_MAX_CONTENT_LENGTH", upload_body_bytes * app.config["BATCH_MAX_FILES"])
+
+    upload_service = UploadService(max_bytes=app.config["UPLOAD_MAX_BYTES"])
+    ocr_cache = None
+    if app.config["OCR_CACHE_MAX_BYTES"]:
+        ocr_cache = OCRCache(max_bytes=app.config["OCR_CACHE_MAX_BYTES"])
+    preprocessor = None
+    if app.config["OCR_PREPROCESS"]:
+        preprocessor = ImagePreprocessor(target_dpi=app.config["OCR_TARGET_DPI"])
+    ocr_service = OCRService(
+        cache=ocr_cache,
+        preprocessor=preprocessor,
+        adaptive=app.config["OCR_ADAPTIVE"],
+        fast_dpi=app.config["OCR_FAST_DPI"],
+        min_confidence=app.config["OCR_MIN_CONFIDENCE"],
+        backend=app.config["OCR_BACKEND"],
+        text_layer=app.config["OCR_TEXT_LAYER"],
+        text_layer_min_chars=app.config["OCR_TEXT_LAYER_MIN_CHARS"],
+    )
+    if app.config["EXCEL_PARTITIONING"]:
+        excel_service = PartitionedExcelService(
+            directory=app.config["EXCEL_PARTITION_DIR"],
+            scheme=app.config["EXCEL_PARTITIONING"],
+            max_rows=app.config["EXCEL_PARTITION_ROWS"],
+            date_source=app.config["EXCEL_PARTITION_DATE"],
+        )
+    else:
+        excel_service = ExcelService()
+    excel_writer = excel_service
+    if app.config["EXCEL_BATCH_SIZE"]:
+        excel_writer = BufferedExcelWriter(
+            excel_service,
+            batch_size=app.config["EXCEL_BATCH_SIZE"],
+            flush_interval=app.config["EXCEL_FLUSH_INTERVAL"],
+        )
+    app.extensions["excel_writer"] = excel_writer
+
+    # Motor de extração único do processo: carrega modelo e histórico uma vez
+    engine = ExtractionEngine(
+        model_backend=app.config["MODEL_BACKEND"],
+        onnx_model_path=app.config["MODEL_ONNX_PATH"],
+        result_cache_size=app.config["AI_RESULT_CACHE_SIZE"],
+    )
+    engine.warm_up(background_model=app.config["MODEL_BACKGROUND_LOAD"])
+    set_engine(engine)
+
+    # Reenvios do mesmo arquivo devolvem o resultado salvo, sem nova linha na planilha
+    processor = CertificateProcessor(
+        ocr_service,
+        engine,
+        excel_writer,
+        force_full_ocr=app.config["OCR_FORCE_FULL"],
+        result_store=ProcessedResultStore(upload_service.upload_folder),
+    )
+    job_service = JobService(
+        max_workers=app.config["JOB_WORKERS"],
+        max_pending=app.config["JOB_MAX_PENDING"],
+        result_ttl=app.config["JOB_RESULT_TTL"],
+    )
+    app.extensions["job_service"] = job_service
+
+    @app.after_request
+    def count_request(response):
+        REQUESTS_TOTAL.inc(endpoint=request.endpoint or "unknown", status=response.status_code)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Exporta as métricas no formato de texto do Prometheus."""
+
+        return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
 
     @app.route("/", methods=["GET", "POST"])
     def upload_file():
@@ -230,43 +417,14 @@ def create_app():
                 )
             else:
                 try:
-                    file_path = upload_service.save_uploaded_file(file)
-                    text = ocr_service.extract_text(file_path)
-                    
-                    # DEBUG: Imprime o texto extraído pelo OCR
-                    print("\n" + "="*80)
-                    print("TEXTO EXTRAÍDO PELO OCR:")
-                    print("="*80)
-                    print(text)
-                    print("="*80 + "\n")
-                    
-                    # Verifica se o OCR retornou texto válido
-                    if not text or not text.strip():
-                        error_message = (
-                            "O OCR não conseguiu extrair texto da imagem. "
-                            "Verifique se a imagem está legível e em boa qualidade."
-                        )
-                    else:
-                        # Tenta usar IA primeiro, com fallback para método tradicional
-                        try:
-                            from services.nlp_service import extract_info_with_ai
-                            data = extract_info_with_ai(text, use_ai=True)
-                        except ImportError:
-                            # Fallback se função não estiver disponível
-                            data = nlp_service.extract_info(text)
-                        
-                        # Conta quantos campos foram encontrados (não são mensagens de erro)
-                        found_count = sum(1 for value in data.values() 
-                                        if not ("não foi encontrado" in value or "não foram encontrados" in value))
-                        
-                        # Salva no Excel mesmo se alguns campos não foram encontrados
-                        excel_service.save_data(data)
-                        
-                        result = data
-                        if found_count > 0:
-                            status_message = f"Atestado processado com sucesso! {found_count} campo(s) encontrado(s). Os dados foram salvos na planilha."
-                        else:
-                            status_message = "Atestado processado, mas nenhum campo foi encontrado. Verifique se a imagem está legível."
+                    stored = upload_service.store_uploaded_file(file)
+                    outcome = processor.process(stored.path, file_digest=stored.sha256)
+                    result = outcome["data"]
+                    status_message = build_status_message(
+                        outcome["found_count"], outcome["reused"], buffered=excel_writer is not excel_service
+                    )
+                except EmptyTextError as exc:
+                    error_message = str(exc)
                 except Exception as exc:
                     error_message = (
                         "Não foi possível processar o atestado. Pode haver falhas de leitura da imagem ou o texto pode estar fora do padrão esperado. "
@@ -280,11 +438,162 @@ def create_app():
             error_message=error_message,
         )
 
+    @app.route("/ready", methods=["GET"])
+    def ready():
+        """Indica se o motor de extração já atende requisições (o modelo pode ainda estar carregando)."""
+
+        status = engine.status()
+        return jsonify(status), (200 if status["ready"] else 503)
+
+    @app.route("/batch", methods=["POST"])
+    def process_batch():
+        """Processa vários atestados enviados de uma vez (campo `files`)."""
+
+        files = [file for file in request.files.getlist("files") if file and file.filename]
+        if not files:
+            return jsonify(error="Nenhum arquivo foi enviado."), 400
+        if len(files) > app.config["BATCH_MAX_FILES"]:
+            return jsonify(error=f"Envie no máximo {app.config['BATCH_MAX_FILES']} arquivos por lote."), 413
+
+        results = [{"filename": file.filename} for file in files]
+        saved = []
+        for result, file in zip(results, files):
+            try:
+                saved.append((result, upload_service.store_uploaded_file(file)))
+            except ValueError as exc:
+                result["error"] = str(exc)
+
+        outcomes = processor.process_many(
+            [stored.path for _, stored in saved],
+            max_workers=app.config["BATCH_WORKERS"],
+            file_digests=[stored.sha256 for _, stored in saved],
+        )
+        for (result, stored), outcome in zip(saved, outcomes):
+            result["sha256"] = stored.sha256
+            result["duplicate"] = stored.duplicate
+            if "error" in outcome:
+                result["error"] = outcome["error"]
+            else:
+                result["result"] = outcome["data"]
+                result["found_count"] = outcome["found_count"]
+                result["page_sources"] = outcome["page_sources"]
+                result["reused"] = outcome["reused"]
+
+        processed = sum(1 for result in results if "error" not in result)
+        return jsonify(processed=processed, failed=len(results) - processed, files=results)
+
+    @app.route("/certificates", methods=["GET"])
+    def list_certificates():
+        """Lista os atestados gravados na planilha, com filtros e paginação."""
+
+        try:
+            page = int(request.args.get("page", 1))
+            per_page = int(request.args.get("per_page", app.config["CERTIFICATES_PER_PAGE"]))
+        except ValueError:
+            return jsonify(error="Os parâmetros page e per_page devem ser números inteiros."), 400
+        if page < 1 or per_page < 1:
+            return jsonify(error="Os parâmetros page e per_page devem ser maiores que zero."), 400
+        per_page = min(per_page, app.config["CERTIFICATES_MAX_PER_PAGE"])
+
+        try:
+            found = excel_service.query(
+                cid=request.args.get("cid"),
+                doctor=request.args.get("doctor"),
+                date_from=request.args.get("date_from"),
+                date_to=request.args.get("date_to"),
+                offset=(page - 1) * per_page,
+                limit=per_page,
+            )
+        except ValueError as exc:
+            return jsonify(error=str(exc)), 400
+
+        return jsonify(
+            total=found["total"],
+            page=page,
+            per_page=per_page,
+            pages=(found["total"] + per_page - 1) // per_page,
+            items=found["items"],
+        )
+
+    @app.route("/jobs", methods=["POST"])
+    def create_job():
+        """Recebe o atestado e agenda o processamento em segundo plano."""
+
+        file = request.files.get("file")
+        if not file or not file.filename:
+            return jsonify(error="Nenhum arquivo foi enviado."), 400
+
+        try:
+            stored = upload_service.store_uploaded_file(file)
+        except UploadTooLargeError as exc:
+            return jsonify(error=str(exc)), 413
+        except ValueError as exc:
+            return jsonify(error=str(exc)), 400
+
+        try:
+            job = job_service.submit(
+                processor.process, stored.path, file_digest=stored.sha256, description=file.filename
+            )
+        except QueueFullError as exc:
+            return jsonify(error=str(exc)), 503
+
+        body = job.to_dict()
+        body["status_url"] = url_for("job_status", job_id=job.id)
+        body["result_url"] = url_for("job_result", job_id=job.id)
+        return jsonify(body), 202, {"Location": body["status_url"]}
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id):
+        """Retorna o estado de um job."""
+
+        job = job_service.get(job_id)
+        if job is None:
+            return jsonify(error="Job não encontrado."), 404
+        return jsonify(job.to_dict())
+
+    @app.route("/jobs/<job_id>/result", methods=["GET"])
+    def job_result(job_id):
+        """Retorna o resultado de um job concluído."""
+
+        job = job_service.get(job_id)
+        if job is None:
+            return jsonify(error="Job não encontrado."), 404
+        if job.status == "error":
+            return jsonify(job.to_dict()), 422
+        if job.status != "done":
+            return jsonify(job.to_dict()), 202
+
+        body = job.to_dict()
+        body["result"] = job.result["data"]
+        body["status_message"] = build_status_message(
+            job.result["found_count"], job.result["reused"], buffered=excel_writer is not excel_service
+        )
+        body["page_sources"] = job.result["page_sources"]
+        body["reused"] = job.result["reused"]
+        return jsonify(body)
+
     return app
 
 
-app = create_app()
+_app = None
+
+
+def get_app():
+    """Retorna a aplicação do módulo, criada no primeiro uso."""
+
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+
+def __getattr__(name):
+    # `app` é criado só quando acessado (ex.: `flask --app app run` ou
+    # `gunicorn app:app`), e não ao importar o módulo
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    get_app().run(debug=True)
@@ -0,0 +1,252 @@
+"""
+Benchmark reproduzível das etapas do processamento de atestados.
+
+Mede separadamente: gravação do upload, OCR, NLPService.extract_info,
+AIService.extract_with_ai, extract_info_with_ai e ExcelService.save_data,
+usando como base as imagens `uploads/atestado_medico*.jpg` e o histórico
+`ai_corrections_history.json`.
+
+Uso:
+    python benchmark.py --stub-ocr                 # sem Tesseract
+    python benchmark.py --save-baseline            # grava a linha de base
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.25
+
+Com `--baseline`, o script termina com código 1 se o p95 de alguma etapa
+piorar mais do que a tolerância em relação à linha de base.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "benchmark_baseline.json")
+HISTORY_FIXTURE = os.path.join(ROOT_DIR, "ai_corrections_history.json")
+IMAGE_FIXTURES = sorted(glob.glob(os.path.join(ROOT_DIR, "uploads", "atestado_medico*.jpg")))
+
+
+class StubOCRService:
+    """OCR falso: devolve os textos do histórico de correções, sem Tesseract."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self._by_path = {}
+
+    def extract_text(self, file_path):
+        if file_path not in self._by_path:
+            self._by_path[file_path] = self.texts[len(self._by_path) % len(self.texts)]
+        return self._by_path[file_path]
+
+
+def percentile(samples, pct):
+    """Percentil pelo método do posto mais próximo."""
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(samples):
+    """Resume as durações (segundos) de uma etapa."""
+    total = sum(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+        "throughput_per_s": len(samples) / total if total else float("inf"),
+    }
+
+
+def time_stage(func, inputs, iterations, warmup):
+    """Executa `func` sobre cada entrada, `warmup` vezes sem medir e `iterations` vezes medindo."""
+    for _ in range(warmup):
+        for item in inputs:
+            func(item)
+
+    samples = []
+    for _ in range(iterations):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def load_history_texts():
+    with open(HISTORY_FIXTURE, "r", encoding="utf-8") as f:
+        history = json.load(f)
+    return [c.get("text_full") or c.get("text_snippet", "") for c in history if c.get("text_full") or c.get("text_snippet")]
+
+
+def run_benchmarks(args, workdir):
+    """Executa todas as etapas e retorna {etapa: resumo}."""
+    results = {}
+    history_texts = load_history_texts()
+
+    def run(name, build):
+        """Prepara e mede uma etapa; etapas com dependências ausentes são puladas."""
+        try:
+            func, inputs = build()
+        except ImportError as e:
+            print(f"⚠ Etapa '{name}' ignorada: dependência ausente ({e})")
+            return
+        # Os serviços imprimem mensagens a cada extração; não polui a saída
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples = time_stage(func, inputs, args.iterations, args.warmup)
+        results[name] = summarize(samples)
+        print(f"✓ {name}: p50={results[name]['p50_ms']:.2f}ms p95={results[name]['p95_ms']:.2f}ms "
+              f"({results[name]['throughput_per_s']:.1f}/s)")
+
+    # Upload: grava os bytes das imagens de exemplo em uma pasta temporária
+    stored_paths = []
+
+    def build_upload():
+        from werkzeug.datastructures import FileStorage
+        from services.upload_service import UploadService
+
+        upload_service = UploadService(upload_folder=os.path.join(workdir, "uploads"))
+        fixtures = [(os.path.basename(p), open(p, "rb").read()) for p in IMAGE_FIXTURES]
+
+        def save(fixture):
+            name, data = fixture
+            path = upload_service.save_uploaded_file(FileStorage(stream=io.BytesIO(data), filename=name))
+            stored_paths.append(path)
+        return save, fixtures
+
+    run("upload_save", build_upload)
+    image_paths = sorted(set(stored_paths)) or IMAGE_FIXTURES
+
+    # OCR: Tesseract real ou textos do histórico (--stub-ocr)
+    ocr_texts = {}
+
+    def build_ocr():
+        if args.stub_ocr:
+            ocr_service = StubOCRService(history_texts)
+        else:
+            from services.image_preprocessing import ImagePreprocessor
+            from services.ocr_service import OCRService
+            ocr_service = OCRService(
+                tesseract_cmd=args.tesseract_cmd,
+                preprocessor=None if args.no_preprocess else ImagePreprocessor(),
+            )
+
+        def ocr(path):
+            ocr_texts[path] = ocr_service.extract_text(path)
+        return ocr, image_paths
+
+    run("ocr", build_ocr)
+    texts = [t for t in ocr_texts.values() if t and t.strip()] or history_texts
+
+    def build_nlp():
+        from services.nlp_service import NLPService
+        return NLPService().extract_info, texts
+
+    run("nlp_extract_info", build_nlp)
+
+    def build_ai():
+        from services.ai_service import AIService
+        # Sem o cache de resultados: mede a extração, não a consulta ao cache
+        return AIService(use_advanced_nlp=args.bert, result_cache_size=0).extract_with_ai, texts
+
+    run("ai_extract_with_ai", build_ai)
+
+    def build_combined():
+        from services.extraction_engine import ExtractionEngine, set_engine
+        from services.nlp_service import extract_info_with_ai
+        set_engine(ExtractionEngine(use_advanced_nlp=args.bert, result_cache_size=0).warm_up())
+        return extract_info_with_ai, texts
+
+    run("extract_info_with_ai", build_combined)
+
+    def build_excel():
+        from services.excel_service import ExcelService
+        from services.nlp_service import NLPService
+
+        excel_service = ExcelService(os.path.join(workdir, "atestados_benchmark.xlsx"))
+        nlp = NLPService()
+        rows = [nlp.extract_info(t) for t in texts]
+        return excel_service.save_data, rows
+
+    run("excel_save_data", build_excel)
+
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Retorna as etapas cujo p95 piorou além da tolerância."""
+    regressions = []
+    for stage, current in results.items():
+        reference = baseline.get(stage)
+        if not reference:
+            continue
+        limit = reference["p95_ms"] * (1 + tolerance)
+        if current["p95_ms"] > limit:
+            regressions.append((stage, reference["p95_ms"], current["p95_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do Leitor de Atestados.")
+    parser.add_argument("--iterations", type=int, default=20, help="Repetições medidas por entrada")
+    parser.add_argument("--warmup", type=int, default=2, help="Repetições de aquecimento (não medidas)")
+    parser.add_argument("--stub-ocr", action="store_true", help="Usa textos do histórico no lugar do Tesseract")
+    parser.add_argument("--tesseract-cmd", default=None, help="Caminho do executável do Tesseract")
+    parser.add_argument("--no-preprocess", action="store_true", help="Envia as imagens ao OCR sem pré-processamento")
+    parser.add_argument("--bert", action="store_true", help="Carrega o modelo BERT nas etapas de IA")
+    parser.add_argument("--baseline", default=None, help="Arquivo de linha de base para comparação")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como linha de base")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Piora aceitável do p95 (0.25 = 25%%)")
+    parser.add_argument("--output", default=None, help="Grava os resultados em JSON")
+    args = parser.parse_args()
+
+    # O AIService lê o histórico a partir do diretório atual: usa uma cópia
+    # temporária para que o benchmark não altere os dados do repositório
+    workdir = tempfile.mkdtemp(prefix="leitor_benchmark_")
+    shutil.copy(HISTORY_FIXTURE, workdir)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = run_benchmarks(args, workdir)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        path = args.baseline or DEFAULT_BASELINE
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Linha de base gravada em {path}")
+        return 0
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n⚠ Regressões de desempenho (p95):")
+            for stage, before, after in regressions:
+                print(f"  {stage}: {before:.2f}ms → {after:.2f}ms")
+            return 1
+        print("\n✓ Nenhuma regressão em relação à linha de base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
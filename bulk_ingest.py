@@ -0,0 +1,232 @@
+"""
+Importação em lote de uma pasta de atestados.
+
+Percorre a pasta (por exemplo `uploads/`), executa OCR e extração em paralelo em
+vários processos e grava todas as linhas na planilha com uma única gravação do
+ExcelService. Um manifesto (JSONL) registra cada arquivo concluído, de modo que
+uma execução interrompida continua de onde parou. As linhas são gravadas na
+ordem dos caminhos dos arquivos, e o resultado de cada arquivo gravado é
+registrado em `uploads/<sha256>.json`, como no aplicativo web: reenviar o mesmo
+arquivo pelo navegador não cria uma linha duplicada.
+
+Uso:
+    python bulk_ingest.py uploads/
+    python bulk_ingest.py uploads/ --workers 4 --bert
+    python bulk_ingest.py uploads/ --partition month
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from services.extraction_engine import FIELDS, is_found  # noqa: E402
+from services.ocr_cache import OCRCache  # noqa: E402
+from services.result_store import ProcessedResultStore  # noqa: E402
+from services.upload_service import UploadService  # noqa: E402
+
+
+MANIFEST_NAME = ".bulk_ingest_manifest.jsonl"
+
+# Serviços de cada processo de trabalho (criados uma vez por processo)
+_worker = {}
+
+
+def _init_worker(tesseract_cmd, use_bert, use_cache, preprocess, full_ocr, adaptive, backend, model_backend):
+    """Cria OCR e motor de extração uma única vez em cada processo de trabalho."""
+    from services.extraction_engine import ExtractionEngine
+    from services.image_preprocessing import ImagePreprocessor
+    from services.ocr_service import OCRService
+    from services.processing_service import CertificateProcessor
+
+    # Os arquivos já são distribuídos entre processos: cada PDF é lido
+    # sequencialmente dentro do seu processo
+    _worker["ocr"] = OCRService(
+        tesseract_cmd=tesseract_cmd,
+        pdf_workers=1,
+        cache=OCRCache() if use_cache else None,
+        preprocessor=ImagePreprocessor() if preprocess else None,
+        adaptive=adaptive,
+        backend=backend,
+    )
+    _worker["engine"] = ExtractionEngine(use_advanced_nlp=use_bert, model_backend=model_backend).warm_up()
+    # Sem --full-ocr, o OCR de um PDF para assim que todos os campos aparecem
+    processor = CertificateProcessor(_worker["ocr"], _worker["engine"], None)
+    _worker["stop_when"] = None if full_ocr else processor.fields_complete
+    _worker["is_complete"] = processor.fields_complete
+
+
+def _process_file(path, digest):
+    """Executa OCR e extração de um arquivo em um processo de trabalho."""
+    try:
+        page_sources = []
+        text = _worker["ocr"].extract_text(
+            path,
+            file_digest=digest,
+            stop_when=_worker["stop_when"],
+            is_complete=_worker["is_complete"],
+            page_sources=page_sources,
+        )
+        if not text or not text.strip():
+            return {"error": "O OCR não conseguiu extrair texto do arquivo."}
+        return {"data": _worker["engine"].extract(text, use_ai=True), "page_sources": page_sources}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def find_files(directory, upload_service):
+    """Lista os arquivos aceitos da pasta (recursivamente), em ordem."""
+    found = []
+    for current_dir, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if upload_service.is_allowed_file(filename):
+                found.append(os.path.join(current_dir, filename))
+    return found
+
+
+def load_manifest(path):
+    """
+    Lê o manifesto de uma execução anterior.
+
+    Returns:
+        Dicionário {arquivo: último registro} (linhas corrompidas são ignoradas)
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["file"]] = entry
+    return entries
+
+
+def append_manifest(handle, entry):
+    """Registra um arquivo no manifesto e força a escrita em disco."""
+    handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    handle.flush()
+    os.fsync(handle.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa em lote uma pasta de atestados para a planilha.")
+    parser.add_argument("directory", help="Pasta com os atestados (PDF ou imagens)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos de OCR/extração")
+    parser.add_argument("--manifest", default=None, help=f"Arquivo de manifesto (padrão: <pasta>/{MANIFEST_NAME})")
+    parser.add_argument("--excel", default="atestados.xlsx", help="Planilha de destino (sem --partition)")
+    parser.add_argument("--partition", default="none", choices=("month", "rows", "none"),
+                        help="Divide as planilhas em atestados/ (month: uma por mês; rows: por quantidade "
+                             "de linhas; padrão: none, tudo em --excel)")
+    parser.add_argument("--tesseract-cmd", default=None, help="Caminho do executável do Tesseract")
+    parser.add_argument("--bert", action="store_true", help="Carrega o modelo BERT em cada processo")
+    parser.add_argument("--model-backend", default="pytorch", choices=("pytorch", "onnx"),
+                        help="Backend do BERT (onnx: modelo quantizado de models/bert-onnx-int8)")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de OCR")
+    parser.add_argument("--full-ocr", action="store_true", help="Lê todas as páginas dos PDFs")
+    parser.add_argument("--ocr-backend", default="auto", choices=("auto", "tesserocr", "pytesseract"),
+                        help="Backend do Tesseract (padrão: tesserocr se instalado)")
+    parser.add_argument("--adaptive", action="store_true", help="OCR rápido em DPI baixo, relendo só o necessário")
+    parser.add_argument("--no-preprocess", action="store_true", help="Envia as imagens ao OCR sem pré-processamento")
+    args = parser.parse_args()
+
+    directory = os.path.abspath(args.directory)
+    manifest_path = args.manifest or os.path.join(directory, MANIFEST_NAME)
+    upload_service = UploadService(upload_folder=directory)
+
+    files = find_files(directory, upload_service)
+    manifest = load_manifest(manifest_path)
+
+    # Decide o que falta: arquivos já gravados são pulados; arquivos já
+    # extraídos (mas não gravados) só voltam para a planilha
+    pending_rows = []
+    to_process = []
+    for path in files:
+        relative = os.path.relpath(path, directory)
+        digest = OCRCache.file_digest(path)
+        entry = manifest.get(relative)
+        if entry and entry.get("sha256") == digest and entry.get("status") == "saved":
+            continue
+        if entry and entry.get("sha256") == digest and entry.get("status") == "extracted":
+            pending_rows.append((relative, digest, entry["data"], entry.get("page_sources", [])))
+            continue
+        to_process.append((relative, path, digest))
+
+    skipped = len(files) - len(to_process) - len(pending_rows)
+    print(f"Arquivos encontrados: {len(files)} | já concluídos: {skipped} | "
+          f"a gravar: {len(pending_rows)} | a processar: {len(to_process)}")
+
+    start = time.perf_counter()
+    errors = 0
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        if to_process:
+            workers = max(1, min(args.workers, len(to_process)))
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(args.tesseract_cmd, args.bert, not args.no_cache, not args.no_preprocess,
+                          args.full_ocr, args.adaptive, args.ocr_backend, args.model_backend),
+            ) as pool:
+                futures = {
+                    pool.submit(_process_file, path, digest): (relative, digest)
+                    for relative, path, digest in to_process
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    relative, digest = futures[future]
+                    outcome = future.result()
+                    if "error" in outcome:
+                        errors += 1
+                        append_manifest(manifest_file, {
+                            "file": relative, "sha256": digest, "status": "error", "error": outcome["error"],
+                        })
+                        print(f"[{done}/{len(to_process)}] ⚠ {relative}: {outcome['error']}")
+                        continue
+                    append_manifest(manifest_file, {
+                        "file": relative, "sha256": digest, "status": "extracted", "data": outcome["data"],
+                        "page_sources": outcome["page_sources"],
+                    })
+                    pending_rows.append((relative, digest, outcome["data"], outcome["page_sources"]))
+                    print(f"[{done}/{len(to_process)}] ✓ {relative}")
+
+        if pending_rows:
+            from services.excel_partitions import PartitionedExcelService
+            from services.excel_service import ExcelService
+
+            if args.partition == "none":
+                excel = ExcelService(args.excel)
+            else:
+                excel = PartitionedExcelService(scheme=args.partition)
+            # Uma única gravação por planilha para todas as linhas, na ordem
+            # dos arquivos (e não na ordem em que os processos terminaram)
+            pending_rows.sort(key=lambda row: row[0])
+            excel.save_rows([data for _, _, data, _ in pending_rows])
+            results = ProcessedResultStore()
+            for relative, digest, data, page_sources in pending_rows:
+                # Mesmo registro do CertificateProcessor: o arquivo não é
+                # gravado de novo se for enviado depois pelo aplicativo web
+                results.set(digest, {
+                    "data": data,
+                    "found_count": sum(1 for key in FIELDS if is_found(data.get(key, ""))),
+                    "page_sources": page_sources,
+                })
+                append_manifest(manifest_file, {"file": relative, "sha256": digest, "status": "saved"})
+
+    elapsed = time.perf_counter() - start
+    destination = args.excel if args.partition == "none" else "atestados/"
+    print(f"\n✓ {len(pending_rows)} linha(s) gravada(s) em {destination} em {elapsed:.1f}s"
+          + (f" ({errors} erro(s); execute novamente para tentar de novo)" if errors else ""))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Lista as planilhas particionadas e gera uma planilha única com todos os atestados.
+
+Uso:
+    python export_atestados.py --list
+    python export_atestados.py --output atestados_completo.xlsx
+    python export_atestados.py --output 2024.xlsx --from 01/01/2024 --to 31/12/2024
+
+Com `--from`/`--to`, só entram as partições cujo intervalo de datas de emissão
+se sobrepõe ao pedido (a planilha antiga, sem intervalo conhecido, sempre entra).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from services.excel_partitions import PartitionedExcelService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta as planilhas particionadas de atestados.")
+    parser.add_argument("--directory", default="atestados", help="Pasta das partições (padrão: atestados)")
+    parser.add_argument("--output", default="atestados_completo.xlsx", help="Planilha combinada gerada")
+    parser.add_argument("--from", dest="date_from", default=None, help="Data de emissão inicial")
+    parser.add_argument("--to", dest="date_to", default=None, help="Data de emissão final")
+    parser.add_argument("--list", action="store_true", help="Apenas lista as partições do catálogo")
+    args = parser.parse_args()
+
+    store = PartitionedExcelService(directory=args.directory)
+
+    if args.list:
+        for entry in store.partitions():
+            rows = "?" if entry["rows"] is None else entry["rows"]
+            dates = f"{entry['first_date'] or '-'} a {entry['last_date'] or '-'}"
+            label = " (planilha antiga)" if entry.get("legacy") else ""
+            print(f"{entry['name']:<22} {rows:>7} linha(s)  {dates}  {entry['file']}{label}")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        written = store.merge(args.output, date_from=args.date_from, date_to=args.date_to)
+    except ValueError as e:
+        print(f"⚠ {e}")
+        return 1
+    print(f"✓ {written} linha(s) exportada(s) para {args.output} em {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
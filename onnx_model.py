@@ -0,0 +1,231 @@
+"""
+Exporta o modelo BERT de NER para ONNX quantizado em int8 e compara com o PyTorch.
+
+O modelo exportado é usado pelo AIService com `MODEL_BACKEND: "onnx"`.
+
+Uso:
+    python onnx_model.py export                      # grava models/bert-onnx-int8
+    python onnx_model.py export --isa avx2 --output /opt/modelos/bert-int8
+    python onnx_model.py compare --iterations 20     # latência e memória dos backends
+
+A comparação carrega cada backend em um processo separado (para medir a
+memória residente de forma isolada) e roda o BERT sobre os textos do
+histórico `ai_corrections_history.json`.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmark import HISTORY_FIXTURE, load_history_texts, percentile
+from services.ai_service import BERT_MODEL_NAME, DEFAULT_ONNX_MODEL_PATH
+
+
+# Conjuntos de instruções suportados pela quantização dinâmica do onnxruntime
+QUANTIZATION_TARGETS = ("avx2", "avx512", "avx512_vnni", "arm64")
+
+
+def export(model_name, output_dir, isa):
+    """
+    Exporta o modelo para ONNX e aplica quantização dinâmica (pesos em int8).
+
+    Args:
+        model_name: Modelo do Hugging Face ou pasta local (PyTorch)
+        output_dir: Pasta onde o modelo quantizado e o tokenizer são gravados
+        isa: Conjunto de instruções da CPU de destino (ver QUANTIZATION_TARGETS)
+    """
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    with tempfile.TemporaryDirectory(prefix="leitor_onnx_") as fp32_dir:
+        print(f"Exportando {model_name} para ONNX...")
+        model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+        model.save_pretrained(fp32_dir)
+
+        print(f"Quantizando em int8 ({isa})...")
+        quantization_config = getattr(AutoQuantizationConfig, isa)(is_static=False, per_channel=False)
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+        quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config)
+
+    model.config.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    print(f"✓ Modelo quantizado gravado em {output_dir}")
+
+
+def peak_rss_mb():
+    """
+    Pico de memória residente do processo, em MB.
+
+    Usa `resource` (POSIX) e, no Windows, o `psutil` se estiver instalado.
+
+    Returns:
+        float ou None se não for possível medir nesta plataforma
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é informado em bytes no macOS e em KB no Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def format_mb(value, width):
+    """Formata uma medida de memória para a tabela (traço quando indisponível)."""
+    return f"{'-':>{width}}  " if value is None else f"{value:>{width}.0f}MB"
+
+
+def measure(backend, model_name, onnx_model_path, iterations):
+    """
+    Carrega um backend e mede carregamento, latência por texto e memória.
+
+    Deve rodar em um processo próprio, dentro de uma pasta com o histórico.
+
+    Returns:
+        dict: Tempos (ms), pico de memória residente (MB, None se não for
+        possível medir) e entidades por texto
+    """
+    from services.ai_service import AIService
+
+    rss_before = peak_rss_mb()
+    service = AIService(
+        load_model=False, model_backend=backend, onnx_model_path=onnx_model_path, model_name=model_name
+    )
+    start = time.perf_counter()
+    service.load_model()
+    load_seconds = time.perf_counter() - start
+    if not service.nlp_model:
+        raise RuntimeError(f"Backend {backend} indisponível")
+
+    texts = [service._normalize_text(text) for text in load_history_texts()]
+    service._extract_with_bert(texts[0])  # aquecimento
+
+    samples = []
+    entities = []
+    for _ in range(iterations):
+        entities = []
+        for text in texts:
+            start = time.perf_counter()
+            found = service._extract_with_bert(text)
+            samples.append(time.perf_counter() - start)
+            entities.append([
+                [entity.get("entity_group"), entity.get("word"), entity.get("start"), entity.get("end")]
+                for entity in found
+            ])
+
+    rss_after = peak_rss_mb()
+    return {
+        "backend": backend,
+        "load_ms": load_seconds * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "peak_rss_mb": rss_after,
+        "model_rss_mb": None if rss_after is None or rss_before is None else rss_after - rss_before,
+        "entities": entities,
+    }
+
+
+def run_measurement(backend, model_name, onnx_model_path, iterations):
+    """Executa `measure` em um processo novo, numa cópia temporária do histórico."""
+    workdir = tempfile.mkdtemp(prefix="leitor_onnx_compare_")
+    try:
+        shutil.copy(HISTORY_FIXTURE, workdir)
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_measure", "--backend", backend,
+             "--model", model_name, "--model-path", onnx_model_path, "--iterations", str(iterations)],
+            cwd=workdir,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def entity_agreement(reference, candidate):
+    """Fração das entidades de referência encontradas igualmente pelo outro backend."""
+    total = matched = 0
+    for expected, found in zip(reference, candidate):
+        found = {tuple(entity) for entity in found}
+        total += len(expected)
+        matched += sum(1 for entity in expected if tuple(entity) in found)
+    return matched / total if total else 1.0
+
+
+def compare(model_name, onnx_model_path, iterations):
+    results = [
+        run_measurement(backend, model_name, onnx_model_path, iterations)
+        for backend in ("pytorch", "onnx")
+    ]
+
+    print(f"\n{'Backend':<10} {'carga':>10} {'p50':>10} {'p95':>10} {'RSS pico':>10} {'RSS modelo':>11}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['load_ms']:>8.0f}ms {r['p50_ms']:>8.1f}ms {r['p95_ms']:>8.1f}ms "
+              f"{format_mb(r['peak_rss_mb'], 8)} {format_mb(r['model_rss_mb'], 9)}")
+
+    pytorch, onnx = results
+    agreement = entity_agreement(pytorch["entities"], onnx["entities"])
+    print(f"\nEntidades iguais às do PyTorch: {agreement:.1%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modelo BERT quantizado (ONNX) para o AIService.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta e quantiza o modelo")
+    export_parser.add_argument("--model", default=BERT_MODEL_NAME, help="Modelo de origem (PyTorch)")
+    export_parser.add_argument("--output", default=DEFAULT_ONNX_MODEL_PATH, help="Pasta de destino")
+    export_parser.add_argument("--isa", choices=QUANTIZATION_TARGETS, default="avx2",
+                               help="Conjunto de instruções da CPU de destino")
+
+    compare_parser = subparsers.add_parser("compare", help="Compara latência e memória dos backends")
+    compare_parser.add_argument("--model", default=BERT_MODEL_NAME, help="Modelo PyTorch de referência")
+    compare_parser.add_argument("--model-path", default=DEFAULT_ONNX_MODEL_PATH, help="Pasta do modelo ONNX")
+    compare_parser.add_argument("--iterations", type=int, default=10, help="Repetições medidas por texto")
+    compare_parser.add_argument("--output", default=None, help="Grava os resultados em JSON")
+
+    measure_parser = subparsers.add_parser("_measure")
+    measure_parser.add_argument("--backend", required=True)
+    measure_parser.add_argument("--model", required=True)
+    measure_parser.add_argument("--model-path", required=True)
+    measure_parser.add_argument("--iterations", type=int, required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, args.output, args.isa)
+    elif args.command == "compare":
+        results = compare(args.model, args.model_path, args.iterations)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(measure(args.backend, args.model, args.model_path, args.iterations)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
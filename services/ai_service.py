@@ -3,11 +3,66 @@ Serviço de IA para extração e validação inteligente de informações de ate
 Usa modelos de NLP pré-treinados e técnicas de processamento de linguagem natural.
 """
 
+import copy
+import hashlib
+import os
 import re
+import threading
+from collections import OrderedDict
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime
-import json
-import os
+
+from .corrections_store import CorrectionsStore, SNIPPET_LENGTH
+from .document_index import DocumentIndex, KeywordSet
+from .metrics_service import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL, timed
+from .similarity_index import MinHashLSHIndex
+
+
+# Versão da lógica de extração: incremente ao alterar padrões, validações ou a
+# combinação dos resultados, para descartar os resultados guardados em cache
+EXTRACTOR_VERSION = 1
+
+# Modelo BERT em português usado para NER (Named Entity Recognition)
+BERT_MODEL_NAME = "neuralmind/bert-base-portuguese-cased"
+# Backends de inferência do modelo
+MODEL_BACKENDS = ("pytorch", "onnx")
+# Pasta e arquivo gerados por `python onnx_model.py export` (modelo quantizado em int8)
+DEFAULT_ONNX_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "bert-onnx-int8"
+)
+ONNX_QUANTIZED_FILE = "model_quantized.onnx"
+
+# Padrões dos extratores inteligentes, compilados uma única vez
+_CID_PATTERNS = [
+    re.compile(r'CID[:\s\-]*(?:10[:\s\-]*)?([A-Z]\d{2,3}(?:\.\d{1,2})?)', re.IGNORECASE),
+    re.compile(r'C\.?\s*I\.?\s*D\.?\s*(?:10[:\s\-]*)?[:\s\-]*([A-Z]\d{2,3}(?:\.\d{1,2})?)', re.IGNORECASE),
+    re.compile(r'(?:diagn[oó]stico|c[oó]digo)[:\s]*([A-Z]\d{2,3}(?:\.\d{1,2})?)', re.IGNORECASE),
+]
+_CID_FORMAT = re.compile(r'^[A-Z]\d{2,3}(?:\.\d{1,2})?$')
+
+_NAME = r'([A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+(?:\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+){1,4})'
+_DOCTOR_PATTERNS = [
+    re.compile(r'(?:Dr|Dra|DR|DRA|Doutor|Doutora)\.?\s+' + _NAME, re.IGNORECASE),
+    re.compile(r'Assinado\s+por[:\s]+' + _NAME, re.IGNORECASE),
+    re.compile(r'M[eé]dico[:\s]+' + _NAME, re.IGNORECASE),
+]
+_DOCTOR_CRM_SUFFIX = re.compile(r'\s*CRM.*$', re.IGNORECASE)
+_DOCTOR_NUMBER_SUFFIX = re.compile(r'\s*\d+.*$')
+
+_DATE_PATTERNS = [
+    re.compile(r'(?:data\s+de\s+emiss[aã]o|emitid[oa]\s+em|emiss[aã]o)[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})', re.IGNORECASE),
+    re.compile(r'(?:data\s+de\s+emiss[aã]o|emitid[oa]\s+em|emiss[aã]o)[:\s]*(\d{1,2})\s+de\s+(\w+)\s+de\s+(\d{4})', re.IGNORECASE),
+]
+_DATE_GENERIC = re.compile(r'\b(\d{2}[/-]\d{2}[/-]\d{4})\b')
+_DATE_KEYWORDS = KeywordSet(['emissão', 'emitido', 'data', 'dia'])
+# Caracteres antes e depois de uma data em que as palavras-chave são procuradas
+_DATE_CONTEXT_CHARS = 50
+
+_DAYS_PATTERNS = [
+    re.compile(r'(\d{1,2})\s*(?:\([^)]+\)\s*)?(?:dia|dias)\s*(?:de\s+)?(?:repouso|afastamento|afastado)', re.IGNORECASE),
+    re.compile(r'(?:repouso|afastamento)[:\s]*(\d{1,2})\s*(?:dia|dias)', re.IGNORECASE),
+    re.compile(r'(\d{1,2})\s*(?:dia|dias)\s*(?:de\s+)?(?:repouso|afastamento)', re.IGNORECASE),
+]
 
 
 class AIService:
@@ -16,45 +71,132 @@ class AIService:
     Combina modelos de NLP com regras de validação e correção.
     """
     
-    def __init__(self, use_advanced_nlp: bool = True):
+    def __init__(self, use_advanced_nlp: bool = True, bert_batch_size: int = 8,
+                 bert_token_overlap: int = 32, load_model: bool = True,
+                 model_backend: str = "pytorch", onnx_model_path: Optional[str] = None,
+                 model_name: str = BERT_MODEL_NAME, result_cache_size: int = 256):
         """
         Inicializa o serviço de IA.
         
         Args:
             use_advanced_nlp: Se True, tenta usar modelos avançados (requer transformers)
+            bert_batch_size: Janelas de texto por lote de inferência do BERT
+            bert_token_overlap: Tokens repetidos entre janelas consecutivas de textos longos
+            load_model: Se False, o modelo só é carregado ao chamar `load_model()`;
+                até lá, as extrações usam os padrões inteligentes
+            model_backend: "pytorch" (modelo original, via transformers) ou "onnx"
+                (modelo exportado e quantizado em int8, via onnxruntime)
+            onnx_model_path: Pasta do modelo ONNX (padrão: models/bert-onnx-int8)
+            model_name: Modelo PyTorch (Hugging Face ou pasta local) do backend "pytorch"
+            result_cache_size: Resultados de `extract_with_ai` guardados em memória
+                (LRU, por texto normalizado); 0 desativa o cache
         """
+        if model_backend not in MODEL_BACKENDS:
+            raise ValueError(f"Backend de modelo desconhecido: {model_backend}")
         self.use_advanced_nlp = use_advanced_nlp
         self.nlp_model = None
+        self.model_backend = model_backend
+        self.onnx_model_path = onnx_model_path or DEFAULT_ONNX_MODEL_PATH
+        self.model_name = model_name
+        
+        # Cache LRU dos resultados. A chave inclui a versão do extrator e a
+        # versão (data de modificação e tamanho) do arquivo de correções: uma
+        # correção gravada por qualquer processo invalida tudo
+        self.result_cache_size = result_cache_size
+        self._result_cache: "OrderedDict[Tuple, Dict[str, str]]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        self.bert_batch_size = bert_batch_size
+        self.bert_token_overlap = bert_token_overlap
         
         # Tenta carregar modelo avançado se disponível
-        if use_advanced_nlp:
-            try:
-                from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
-                # Modelo BERT em português para NER (Named Entity Recognition)
-                try:
-                    self.nlp_model = pipeline(
-                        "ner",
-                        model="neuralmind/bert-base-portuguese-cased",
-                        tokenizer="neuralmind/bert-base-portuguese-cased",
-                        aggregation_strategy="simple"
-                    )
-                    print("✓ Modelo BERT carregado com sucesso")
-                except Exception as e:
-                    print(f"⚠ Não foi possível carregar modelo BERT: {e}")
-                    print("  Usando método híbrido (regex + validação inteligente)")
-                    self.use_advanced_nlp = False
-            except ImportError:
-                print("⚠ Biblioteca 'transformers' não instalada. Use: pip install transformers torch")
-                print("  Usando método híbrido (regex + validação inteligente)")
-                self.use_advanced_nlp = False
+        if use_advanced_nlp and load_model:
+            self.load_model()
         
         # Base de conhecimento para validação
         self._init_validation_rules()
         
-        # Histórico de correções para aprendizado
+        # Histórico de correções para aprendizado, com índice de similaridade
+        # (MinHash/LSH) construído uma vez e atualizado a cada nova correção.
+        # O histórico é recarregado quando o arquivo muda (train_ai.py ou outro
+        # processo gravou correções)
         self.corrections_history = []
+        self.corrections_store = CorrectionsStore()
+        self.corrections_signature = None
+        self.similarity_index = MinHashLSHIndex()
+        self._normalized_history: Dict[int, str] = {}
+        self._history_lock = threading.RLock()
         self.load_corrections_history()
-    
+
+    def load_model(self):
+        """
+        Carrega o modelo BERT (e a biblioteca transformers).
+        
+        O modelo só passa a ser usado depois de totalmente carregado, então este
+        método pode rodar em segundo plano enquanto o serviço atende extrações.
+        """
+        if not self.use_advanced_nlp or self.nlp_model is not None:
+            return
+        try:
+            from transformers import pipeline
+        except ImportError:
+            print("⚠ Biblioteca 'transformers' não instalada. Use: pip install transformers torch")
+            print("  Usando método híbrido (regex + validação inteligente)")
+            self.use_advanced_nlp = False
+            return
+        try:
+            if self.model_backend == "onnx":
+                self.nlp_model = self._load_onnx_pipeline(pipeline)
+                print(f"✓ Modelo BERT (ONNX int8) carregado de {self.onnx_model_path}")
+            else:
+                self.nlp_model = pipeline(
+                    "ner",
+                    model=self.model_name,
+                    tokenizer=self.model_name,
+                    aggregation_strategy="simple"
+                )
+                print("✓ Modelo BERT carregado com sucesso")
+        except Exception as e:
+            print(f"⚠ Não foi possível carregar modelo BERT: {e}")
+            print("  Usando método híbrido (regex + validação inteligente)")
+            self.use_advanced_nlp = False
+
+    def _load_onnx_pipeline(self, pipeline):
+        """
+        Monta o pipeline de NER sobre o modelo ONNX quantizado.
+        
+        O pipeline é o mesmo do backend PyTorch (mesma agregação de entidades),
+        então `_merge_extractions` recebe entidades no mesmo formato.
+        
+        Args:
+            pipeline: Função `transformers.pipeline`
+        """
+        if not os.path.isdir(self.onnx_model_path):
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em {self.onnx_model_path!r}. "
+                "Gere com: python onnx_model.py export"
+            )
+        from optimum.onnxruntime import ORTModelForTokenClassification
+        from transformers import AutoTokenizer
+        
+        file_name = None
+        if os.path.exists(os.path.join(self.onnx_model_path, ONNX_QUANTIZED_FILE)):
+            file_name = ONNX_QUANTIZED_FILE
+        model = ORTModelForTokenClassification.from_pretrained(
+            self.onnx_model_path,
+            file_name=file_name,
+            provider="CPUExecutionProvider",
+        )
+        tokenizer = AutoTokenizer.from_pretrained(self.onnx_model_path)
+        return pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+
+    def warm_up(self):
+        """
+        Executa uma inferência curta para que a primeira requisição real não
+        pague o custo de inicialização preguiçosa do modelo.
+        """
+        if self.use_advanced_nlp and self.nlp_model:
+            self._extract_with_bert("Atestado médico emitido pelo Dr. João Silva.")
+
     def _init_validation_rules(self):
         """Inicializa regras de validação baseadas em conhecimento médico."""
         
@@ -108,31 +250,114 @@ class AIService:
         Returns:
             Dicionário com informações extraídas e validadas
         """
-        # Normaliza o texto
-        normalized_text = self._normalize_text(text)
+        return self.extract_many([text])[0]
+    
+    def extract_many(self, texts: List[str]) -> List[Dict[str, str]]:
+        """
+        Extrai informações de vários textos, com uma única inferência em lote
+        do BERT para todos os documentos que não têm correção aprendida.
         
-        # PRIMEIRO: Verifica se há correções aprendidas para este texto
-        learned_correction = self._find_similar_correction(normalized_text)
-        if learned_correction:
-            print("✓ Usando correção aprendida do histórico de treinamento")
-            return learned_correction
+        Args:
+            texts: Textos extraídos do OCR
+            
+        Returns:
+            Lista de dicionários com informações extraídas e validadas, na mesma ordem
+        """
+        results = [None] * len(texts)
+        
+        # Aplica as correções gravadas por outros processos desde a última leitura
+        self.refresh_corrections_history()
+        
+        # Normaliza os textos
+        normalized_texts = [self._normalize_text(text) for text in texts]
+        
+        # Resultados já calculados para o mesmo texto (cópias, para que quem
+        # chamou possa alterá-las sem afetar o cache)
+        cache_keys = [self._result_cache_key(text) for text in normalized_texts]
+        misses = []
+        for index, key in enumerate(cache_keys):
+            cached = self._get_cached_result(key)
+            if cached is None:
+                misses.append(index)
+            else:
+                results[index] = cached
+        
+        # PRIMEIRO: Verifica se há correções aprendidas para cada texto
+        pending = []
+        for index in misses:
+            normalized_text = normalized_texts[index]
+            with timed("similarity_lookup"):
+                learned_correction = self._find_similar_correction(normalized_text)
+            if learned_correction:
+                print("✓ Usando correção aprendida do histórico de treinamento")
+                results[index] = learned_correction
+            else:
+                pending.append(index)
         
         # Extração usando método híbrido
-        if self.use_advanced_nlp and self.nlp_model:
-            # Usa modelo BERT para identificar entidades
-            entities = self._extract_with_bert(normalized_text)
-            results = self._merge_extractions(normalized_text, entities)
-        else:
-            # Usa método baseado em contexto e padrões inteligentes
-            results = self._extract_with_smart_patterns(normalized_text)
+        use_bert = bool(self.use_advanced_nlp and self.nlp_model)
+        if use_bert and pending:
+            # Usa modelo BERT para identificar entidades (todos os documentos em lote)
+            entities_per_text = self._extract_with_bert_batch([normalized_texts[i] for i in pending])
+        
+        for position, index in enumerate(pending):
+            normalized_text = normalized_texts[index]
+            if use_bert:
+                extracted = self._merge_extractions(normalized_text, entities_per_text[position])
+            else:
+                # Usa método baseado em contexto e padrões inteligentes
+                extracted = self._extract_with_smart_patterns(normalized_text)
+            
+            # Valida e corrige os resultados
+            validated_results = self._validate_and_correct(extracted, normalized_text)
+            
+            # Aplica padrões aprendidos do histórico
+            results[index] = self._apply_learned_patterns(normalized_text, validated_results)
         
-        # Valida e corrige os resultados
-        validated_results = self._validate_and_correct(results, normalized_text)
+        for index in misses:
+            self._store_cached_result(cache_keys[index], results[index])
         
-        # Aplica padrões aprendidos do histórico
-        validated_results = self._apply_learned_patterns(normalized_text, validated_results)
+        return results
+    
+    def _result_cache_key(self, normalized_text: str) -> Tuple:
+        """
+        Chave do cache de resultados para um texto normalizado.
         
-        return validated_results
+        Inclui a versão do extrator, a versão do arquivo de correções lida por
+        último (`corrections_signature`, atualizada por
+        `refresh_corrections_history`) e se o BERT já está carregado (o
+        resultado muda quando o modelo termina de carregar em segundo plano).
+        """
+        digest = hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()
+        model_loaded = bool(self.use_advanced_nlp and self.nlp_model)
+        return (digest, EXTRACTOR_VERSION, self.corrections_signature, model_loaded)
+    
+    def _get_cached_result(self, key: Tuple) -> Optional[Dict[str, str]]:
+        if not self.result_cache_size:
+            return None
+        with self._result_cache_lock:
+            result = self._result_cache.get(key)
+            if result is not None:
+                self._result_cache.move_to_end(key)
+        if result is None:
+            CACHE_MISSES_TOTAL.inc(cache="ai_result")
+            return None
+        CACHE_HITS_TOTAL.inc(cache="ai_result")
+        return copy.deepcopy(result)
+    
+    def _store_cached_result(self, key: Tuple, result: Dict[str, str]):
+        if not self.result_cache_size:
+            return
+        with self._result_cache_lock:
+            self._result_cache[key] = copy.deepcopy(result)
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.result_cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def _invalidate_result_cache(self):
+        """Descarta os resultados guardados (o histórico em memória mudou)."""
+        with self._result_cache_lock:
+            self._result_cache.clear()
     
     def _normalize_text(self, text: str) -> str:
         """Normaliza o texto para melhor processamento."""
@@ -146,27 +371,113 @@ class AIService:
     
     def _extract_with_bert(self, text: str) -> List[Dict]:
         """Extrai entidades usando modelo BERT."""
+        return self._extract_with_bert_batch([text])[0]
+    
+    def _extract_with_bert_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """
+        Extrai entidades de vários textos com uma única chamada em lote ao BERT.
+        
+        Os textos longos são divididos em janelas de tokens com sobreposição;
+        as posições das entidades são convertidas para o texto original e as
+        entidades repetidas nas sobreposições são unificadas.
+        
+        Args:
+            texts: Textos normalizados
+            
+        Returns:
+            Lista de entidades de cada texto, na mesma ordem
+        """
+        entities_per_text = [[] for _ in texts]
         try:
-            # Limita o tamanho do texto para o modelo
-            max_length = 512
-            if len(text) > max_length:
-                # Processa em chunks
-                chunks = [text[i:i+max_length] for i in range(0, len(text), max_length-100)]
-                entities = []
-                for chunk in chunks:
-                    chunk_entities = self.nlp_model(chunk)
-                    entities.extend(chunk_entities)
-                return entities
-            else:
-                return self.nlp_model(text)
+            chunks = []
+            owners = []
+            for index, text in enumerate(texts):
+                for offset, chunk in self._chunk_for_bert(text):
+                    chunks.append(chunk)
+                    owners.append((index, offset))
+            if not chunks:
+                return entities_per_text
+            
+            outputs = self.nlp_model(chunks, batch_size=self.bert_batch_size)
+            for (index, offset), chunk_entities in zip(owners, outputs):
+                for entity in chunk_entities:
+                    entity = dict(entity)
+                    if entity.get('start') is not None:
+                        entity['start'] += offset
+                        entity['end'] += offset
+                    entities_per_text[index].append(entity)
+            
+            return [self._merge_overlapping_entities(entities) for entities in entities_per_text]
         except Exception as e:
             print(f"Erro ao usar BERT: {e}")
+            return [[] for _ in texts]
+    
+    def _chunk_for_bert(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Divide o texto em janelas que cabem no modelo, respeitando tokens.
+        
+        Returns:
+            Lista de (posição inicial no texto, trecho)
+        """
+        if not text:
             return []
+        
+        tokenizer = getattr(self.nlp_model, 'tokenizer', None)
+        if tokenizer is None or not getattr(tokenizer, 'is_fast', False):
+            # Sem offsets de tokens: janelas por caracteres, como antes
+            max_length = 512
+            if len(text) <= max_length:
+                return [(0, text)]
+            return [(i, text[i:i+max_length]) for i in range(0, len(text), max_length-100)]
+        
+        # Reserva espaço para os tokens especiais ([CLS] e [SEP])
+        max_tokens = min(getattr(tokenizer, 'model_max_length', 512), 512) - 2
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+        if len(offsets) <= max_tokens:
+            return [(0, text)]
+        
+        chunks = []
+        step = max_tokens - self.bert_token_overlap
+        for first in range(0, len(offsets), step):
+            last = min(first + max_tokens, len(offsets)) - 1
+            start, end = offsets[first][0], offsets[last][1]
+            chunks.append((start, text[start:end]))
+            if last == len(offsets) - 1:
+                break
+        return chunks
+    
+    def _merge_overlapping_entities(self, entities: List[Dict]) -> List[Dict]:
+        """
+        Unifica entidades repetidas nas regiões de sobreposição entre janelas.
+        
+        Entidades do mesmo tipo cujas posições se sobrepõem viram uma só (a
+        mais longa, ou a de maior score em caso de empate).
+        """
+        if not entities or any(e.get('start') is None for e in entities):
+            return entities
+        
+        merged = []
+        for entity in sorted(entities, key=lambda e: (e['start'], -e['end'])):
+            previous = merged[-1] if merged else None
+            if (previous is not None
+                    and previous.get('entity_group') == entity.get('entity_group')
+                    and entity['start'] < previous['end']):
+                previous_key = (previous['end'] - previous['start'], previous.get('score', 0))
+                entity_key = (entity['end'] - entity['start'], entity.get('score', 0))
+                if entity_key > previous_key:
+                    merged[-1] = entity
+                continue
+            merged.append(entity)
+        return merged
     
     def _extract_with_smart_patterns(self, text: str) -> Dict[str, any]:
         """
         Extração inteligente usando padrões contextuais e análise semântica.
+        
+        As palavras-chave do texto são indexadas uma única vez e
+        compartilhadas pelos extratores.
         """
+        index = DocumentIndex(text)
         results = {
             'cid': None,
             'doctor': None,
@@ -182,7 +493,7 @@ class AIService:
         results['doctor'] = self._extract_doctor_smart(text)
         
         # Extração de data com validação
-        results['date'] = self._extract_date_smart(text)
+        results['date'] = self._extract_date_smart(text, index)
         
         # Extração de dias
         results['days'] = self._extract_days_smart(text)
@@ -192,37 +503,14 @@ class AIService:
     def _extract_cid_smart(self, text: str) -> Optional[str]:
         """Extrai CID com validação inteligente."""
         # Padrões mais flexíveis para CID
-        patterns = [
-            r'CID[:\s\-]*(?:10[:\s\-]*)?([A-Z]\d{2,3}(?:\.\d{1,2})?)',
-            r'C\.?\s*I\.?\s*D\.?\s*(?:10[:\s\-]*)?[:\s\-]*([A-Z]\d{2,3}(?:\.\d{1,2})?)',
-            r'(?:diagn[oó]stico|c[oó]digo)[:\s]*([A-Z]\d{2,3}(?:\.\d{1,2})?)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
+        for pattern in _CID_PATTERNS:
+            for match in pattern.finditer(text):
                 cid = match.group(1).upper()
                 if self._validate_cid(cid):
                     return cid
         
-        # Busca por padrão standalone próximo a palavras-chave
-        medical_keywords = ['cid', 'diagnóstico', 'doença', 'código', 'classificação']
-        lines = text.split('\n')
-        
-        for i, line in enumerate(lines):
-            line_upper = line.upper()
-            # Verifica se há palavras-chave próximas
-            context_lines = lines[max(0, i-2):min(len(lines), i+3)]
-            context = ' '.join(context_lines).upper()
-            
-            if any(keyword in context for keyword in medical_keywords):
-                # Procura padrão CID na linha
-                cid_match = re.search(r'\b([A-Z]\d{2,3}(?:\.\d{1,2})?)\b', line, re.IGNORECASE)
-                if cid_match:
-                    cid = cid_match.group(1).upper()
-                    if self._validate_cid(cid):
-                        return cid
-        
+        # Códigos soltos no texto não são aceitos como CID: perto de palavras
+        # como "classificação" ou "código" costumam ser leitos, lotes etc.
         return None
     
     def _validate_cid(self, cid: str) -> bool:
@@ -236,27 +524,19 @@ class AIService:
             return False
         
         # Verifica formato básico
-        if not re.match(r'^[A-Z]\d{2,3}(?:\.\d{1,2})?$', cid):
+        if not _CID_FORMAT.match(cid):
             return False
         
         return True
     
     def _extract_doctor_smart(self, text: str) -> Optional[str]:
         """Extrai nome do médico com validação."""
-        # Padrões para médico
-        patterns = [
-            r'(?:Dr|Dra|DR|DRA|Doutor|Doutora)\.?\s+([A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+(?:\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+){1,4})',
-            r'Assinado\s+por[:\s]+([A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+(?:\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+){1,4})',
-            r'M[eé]dico[:\s]+([A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+(?:\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-Za-zÀ-ÿ]+){1,4})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
+        for pattern in _DOCTOR_PATTERNS:
+            for match in pattern.finditer(text):
                 doctor_name = match.group(1).strip()
                 # Remove CRM e outros identificadores
-                doctor_name = re.sub(r'\s*CRM.*$', '', doctor_name, flags=re.IGNORECASE)
-                doctor_name = re.sub(r'\s*\d+.*$', '', doctor_name)
+                doctor_name = _DOCTOR_CRM_SUFFIX.sub('', doctor_name)
+                doctor_name = _DOCTOR_NUMBER_SUFFIX.sub('', doctor_name)
                 
                 if len(doctor_name) > 3 and self._looks_like_name(doctor_name):
                     return doctor_name
@@ -273,19 +553,11 @@ class AIService:
         # Todas as palavras devem começar com maiúscula
         return all(word[0].isupper() for word in words if word)
     
-    def _extract_date_smart(self, text: str) -> Optional[str]:
+    def _extract_date_smart(self, text: str, index: Optional[DocumentIndex] = None) -> Optional[str]:
         """Extrai data de emissão com validação."""
-        # Prioriza datas próximas a palavras-chave de emissão
-        emission_keywords = ['emissão', 'emitido', 'data', 'dia']
-        
         # Busca por padrões de data com contexto
-        date_patterns = [
-            r'(?:data\s+de\s+emiss[aã]o|emitid[oa]\s+em|emiss[aã]o)[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})',
-            r'(?:data\s+de\s+emiss[aã]o|emitid[oa]\s+em|emiss[aã]o)[:\s]*(\d{1,2})\s+de\s+(\w+)\s+de\s+(\d{4})',
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _DATE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 if len(match.groups()) == 1:
                     date_str = match.group(1)
@@ -297,19 +569,14 @@ class AIService:
                     if date_str:
                         return date_str
         
-        # Busca genérica por datas válidas
-        generic_pattern = r'\b(\d{2}[/-]\d{2}[/-]\d{4})\b'
-        matches = re.finditer(generic_pattern, text)
-        
-        for match in matches:
+        # Busca genérica por datas válidas, priorizando as próximas a
+        # palavras-chave de emissão
+        index = index or DocumentIndex(text)
+        for match in _DATE_GENERIC.finditer(text):
             date_str = match.group(1)
             if self._validate_date(date_str):
                 # Verifica se está em contexto relevante
-                start = max(0, match.start() - 50)
-                end = min(len(text), match.end() + 50)
-                context = text[start:end].lower()
-                
-                if any(keyword in context for keyword in emission_keywords):
+                if index.has_keyword_near(_DATE_KEYWORDS, match.start(), match.end(), _DATE_CONTEXT_CHARS):
                     return self._normalize_date(date_str)
         
         return None
@@ -363,14 +630,8 @@ class AIService:
     
     def _extract_days_smart(self, text: str) -> Optional[int]:
         """Extrai dias de repouso com validação."""
-        patterns = [
-            r'(\d{1,2})\s*(?:\([^)]+\)\s*)?(?:dia|dias)\s*(?:de\s+)?(?:repouso|afastamento|afastado)',
-            r'(?:repouso|afastamento)[:\s]*(\d{1,2})\s*(?:dia|dias)',
-            r'(\d{1,2})\s*(?:dia|dias)\s*(?:de\s+)?(?:repouso|afastamento)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _DAYS_PATTERNS:
+            match = pattern.search(text)
             if match:
                 days = int(match.group(1))
                 # Validação: dias devem ser razoáveis (1 a 365)
@@ -444,32 +705,81 @@ class AIService:
         correction = {
             'original': original,
             'corrected': corrected,
-            'text_snippet': text[:500],  # Primeiros 500 caracteres
+            'text_snippet': text[:SNIPPET_LENGTH],  # Primeiros 500 caracteres
             'text_full': text,  # Texto completo para melhor matching
             'timestamp': datetime.now().isoformat()
         }
         
-        self.corrections_history.append(correction)
-        self.save_corrections_history()
+        with self._history_lock:
+            self.corrections_history.append(correction)
+            self._index_correction(
+                self.similarity_index, self._normalized_history, len(self.corrections_history) - 1, correction
+            )
+        self._invalidate_result_cache()
+        try:
+            self.corrections_store.append(correction)
+        except Exception as e:
+            print(f"Erro ao salvar histórico: {e}")
     
     def load_corrections_history(self):
-        """Carrega histórico de correções."""
-        history_file = 'ai_corrections_history.json'
-        if os.path.exists(history_file):
+        """Carrega histórico de correções (lido linha a linha do log JSONL)."""
+        with self._history_lock:
+            # Lida antes do arquivo: uma correção gravada durante a leitura
+            # provoca uma nova recarga, em vez de ser perdida
+            signature = self.corrections_store.signature()
             try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    self.corrections_history = json.load(f)
-            except:
-                self.corrections_history = []
-        else:
-            self.corrections_history = []
+                history = self.corrections_store.load()
+            except Exception as e:
+                print(f"⚠ Erro ao carregar histórico de correções: {e}")
+                history = []
+            similarity_index = MinHashLSHIndex()
+            normalized_history: Dict[int, str] = {}
+            for position, correction in enumerate(history):
+                self._index_correction(similarity_index, normalized_history, position, correction)
+            
+            self.corrections_history = history
+            self.similarity_index = similarity_index
+            self._normalized_history = normalized_history
+            self.corrections_signature = signature
+        self._invalidate_result_cache()
+
+    def refresh_corrections_history(self) -> bool:
+        """
+        Recarrega o histórico se o arquivo mudou desde a última leitura.
+        
+        Custa apenas um `stat` do arquivo quando nada mudou.
+        
+        Returns:
+            True se o histórico foi recarregado
+        """
+        if self.corrections_store.signature() == self.corrections_signature:
+            return False
+        with self._history_lock:
+            if self.corrections_store.signature() == self.corrections_signature:
+                return False
+            self.load_corrections_history()
+        return True
+
+    def _index_correction(self, similarity_index: MinHashLSHIndex, normalized_history: Dict[int, str],
+                          position: int, correction: Dict):
+        """Adiciona uma correção do histórico ao índice de similaridade."""
+        # Tenta usar texto completo primeiro, depois snippet
+        history_text = correction.get('text_full', '') or correction.get('text_snippet', '')
+        if not history_text:
+            return
+        history_normalized = self._normalize_for_comparison(history_text)
+        normalized_history[position] = history_normalized
+        similarity_index.add(position, set(history_normalized.split()))
     
     def save_corrections_history(self):
-        """Salva histórico de correções."""
-        history_file = 'ai_corrections_history.json'
+        """
+        Regrava todo o histórico de correções (compactação do log).
+        
+        O log é relido sob o lock do arquivo, para não descartar correções
+        gravadas por outros processos depois que este carregou o histórico.
+        """
         try:
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.corrections_history, f, ensure_ascii=False, indent=2)
+            self.corrections_store.compact()
         except Exception as e:
             print(f"Erro ao salvar histórico: {e}")
     
@@ -483,7 +793,12 @@ class AIService:
         Returns:
             Dicionário com correção se encontrada, None caso contrário
         """
-        if not self.corrections_history:
+        # Histórico e índice lidos juntos: uma recarga os substitui ao mesmo tempo
+        with self._history_lock:
+            history = self.corrections_history
+            similarity_index = self.similarity_index
+            normalized_history = self._normalized_history
+        if not history:
             return None
         
         # Normaliza o texto atual para comparação
@@ -493,20 +808,19 @@ class AIService:
         best_similarity = 0.0
         similarity_threshold = 0.70  # 70% de similaridade (reduzido para melhor matching)
         
-        for correction in self.corrections_history:
-            # Tenta usar texto completo primeiro, depois snippet
-            history_text = correction.get('text_full', '') or correction.get('text_snippet', '')
-            if not history_text:
-                continue
-            
-            history_normalized = self._normalize_for_comparison(history_text)
+        # O índice LSH devolve apenas as correções com chance real de passar do
+        # limiar; a similaridade exata é calculada somente para elas, na ordem
+        # do histórico, para manter o mesmo desempate da busca linear
+        candidates = similarity_index.query(set(text_normalized.split()))
+        for position in sorted(candidates):
+            history_normalized = normalized_history[position]
             
             # Calcula similaridade
             similarity = self._calculate_similarity(text_normalized, history_normalized)
             
             if similarity > best_similarity and similarity >= similarity_threshold:
                 best_similarity = similarity
-                best_match = correction.get('corrected', {})
+                best_match = history[position].get('corrected', {})
         
         if best_match:
             print(f"✓ Texto similar encontrado no histórico (similaridade: {best_similarity:.1%})")
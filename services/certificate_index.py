@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from .extraction_engine import is_found
+from .metrics_service import timed
+
+
+CID_FORMAT = re.compile(r"^[A-Z]\d{2,3}(?:\.\d{1,2})?$")
+DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y-%m-%d")
+
+
+def parse_date(value):
+    """
+    Parse an emission date as stored in the spreadsheet or sent in a query.
+
+    Args:
+        value: ``date``/``datetime`` or string (DD/MM/YYYY, DD/MM/YY, DD-MM-YYYY
+            or YYYY-MM-DD)
+
+    Returns:
+        date or None if the value is not a date
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+DOCTOR_TITLE = re.compile(r"^(?:dra|dr|doutora|doutor)\.?\s+")
+
+
+def parse_date_range(date_from, date_to):
+    """
+    Parse the bounds of an emission date filter.
+
+    Returns:
+        tuple: (start, end) dates, None for a missing bound
+
+    Raises:
+        ValueError: If a bound is given but is not a date
+    """
+    bounds = []
+    for value in (date_from, date_to):
+        if value in (None, ""):
+            bounds.append(None)
+            continue
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(f"Data inválida: {value}")
+        bounds.append(parsed)
+    return tuple(bounds)
+
+
+def normalize_doctor(value):
+    """Doctor name as used for lookups: case-folded, single-spaced, without "Dr."/"Dra."."""
+    return DOCTOR_TITLE.sub("", " ".join(str(value).split()).casefold())
+
+
+class CertificateIndex:
+    """
+    Read-only, indexed view of the certificates stored in the spreadsheet.
+
+    Rows are streamed from the workbook in read-only mode, and side indexes
+    are built once: CIDs in sorted order (prefix lookups by bisection),
+    doctors by normalized name and emission dates in sorted order (range
+    lookups by bisection). The index is rebuilt only when the file's
+    modification time or size changes, so polling ``query`` reads the
+    workbook once per change instead of once per call.
+    """
+
+    def __init__(self, excel_service):
+        """
+        Initialize the index (the workbook is read on the first query).
+
+        Args:
+            excel_service: ExcelService that owns the spreadsheet
+        """
+        self.excel_service = excel_service
+        self._lock = threading.Lock()
+        self._signature = None
+        self._rows = []
+        self._cid_keys = []
+        self._cid_rows = []
+        self._doctor_rows = {}
+        self._date_keys = []
+        self._date_rows = []
+
+    def query(self, cid=None, doctor=None, date_from=None, date_to=None, offset=0, limit=50):
+        """
+        Return one page of certificates matching every given filter.
+
+        Args:
+            cid: CID prefix (e.g. "J1" matches J10, J11.1, ...), case-insensitive
+            doctor: Doctor name, exact match ignoring case, spacing and "Dr."/"Dra."
+            date_from: First emission date (inclusive), ``date`` or string
+            date_to: Last emission date (inclusive), ``date`` or string
+            offset: Matching rows to skip
+            limit: Maximum rows returned
+
+        Returns:
+            dict: ``total`` (matching rows), ``offset``, ``limit`` and
+            ``items`` (records in spreadsheet order, with their ``row`` number)
+
+        Raises:
+            ValueError: If a date filter cannot be parsed
+        """
+        rows = self.match(cid=cid, doctor=doctor, date_from=date_from, date_to=date_to)
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "items": [dict(row) for row in rows[offset:offset + limit]],
+        }
+
+    def match(self, cid=None, doctor=None, date_from=None, date_to=None):
+        """
+        Return every record matching the filters (see ``query``).
+
+        Returns:
+            list: Records in spreadsheet order. They are shared with the index
+            and must not be modified.
+
+        Raises:
+            ValueError: If a date filter cannot be parsed
+        """
+        start, end = parse_date_range(date_from, date_to)
+        with self._lock:
+            self._refresh()
+            rows = self._rows
+            matches = None
+            if cid:
+                matches = self._match_cid(cid.strip().upper())
+            if doctor:
+                matches = self._intersect(matches, self._doctor_rows.get(normalize_doctor(doctor), ()))
+            if start or end:
+                matches = self._intersect(matches, self._match_dates(start, end))
+
+        if matches is None:
+            return rows
+        return [rows[position] for position in sorted(matches)]
+
+    def _refresh(self):
+        if self._file_signature() == self._signature:
+            return
+
+        # Writers hold the same lock while saving, so a half-written file is never read
+        with self.excel_service.lock:
+            signature = self._file_signature()
+            rows = self._read_rows() if signature else []
+
+        cids, doctors, dates = [], {}, []
+        for position, record in enumerate(rows):
+            cid = str(record["CID"] or "").strip().upper()
+            if CID_FORMAT.match(cid):
+                cids.append((cid, position))
+            doctor = record["Médico"]
+            if doctor and is_found(str(doctor)):
+                doctors.setdefault(normalize_doctor(doctor), []).append(position)
+            emitted = parse_date(record["Data de Emissão"])
+            if emitted:
+                dates.append((emitted, position))
+        cids.sort()
+        dates.sort()
+
+        self._rows = rows
+        self._cid_keys = [key for key, _ in cids]
+        self._cid_rows = [position for _, position in cids]
+        self._doctor_rows = doctors
+        self._date_keys = [key for key, _ in dates]
+        self._date_rows = [position for _, position in dates]
+        self._signature = signature
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.excel_service.filename)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_rows(self):
+        from openpyxl import load_workbook
+
+        headers = self.excel_service.column_headers
+        rows = []
+        with timed("excel_index"):
+            wb = load_workbook(self.excel_service.filename, read_only=True)
+            try:
+                for number, row in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+                    if not any(cell for cell in row):  # Skip empty rows
+                        continue
+                    record = {header: (row[i] if i < len(row) else "") for i, header in enumerate(headers)}
+                    record["row"] = number
+                    rows.append(record)
+            finally:
+                wb.close()
+        return rows
+
+    def _match_cid(self, prefix):
+        first = bisect_left(self._cid_keys, prefix)
+        last = bisect_left(self._cid_keys, prefix + "\uffff")
+        return set(self._cid_rows[first:last])
+
+    def _match_dates(self, start, end):
+        first = bisect_left(self._date_keys, start) if start else 0
+        last = bisect_right(self._date_keys, end) if end else len(self._date_keys)
+        return set(self._date_rows[first:last])
+
+    @staticmethod
+    def _intersect(matches, positions):
+        positions = set(positions)
+        return positions if matches is None else matches & positions
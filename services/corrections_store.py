@@ -0,0 +1,171 @@
+"""
+Armazenamento append-only do histórico de correções da IA.
+
+Cada correção é gravada como uma linha JSON (JSONL). Salvar uma correção custa
+uma única escrita no fim do arquivo, em vez de reescrever todo o histórico. Uma
+linha truncada por queda do processo é ignorada na leitura (as demais correções
+continuam válidas) e removida na próxima compactação.
+"""
+
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .file_lock import FileLock
+
+
+SNIPPET_LENGTH = 500
+
+
+class CorrectionsStore:
+    """Log JSONL de correções com compactação periódica."""
+
+    def __init__(
+        self,
+        path: str = 'ai_corrections_history.jsonl',
+        legacy_path: str = 'ai_corrections_history.json',
+        compact_every: int = 1000,
+    ):
+        """
+        Inicializa o armazenamento.
+
+        Args:
+            path: Arquivo JSONL do histórico
+            legacy_path: Arquivo JSON do formato antigo, migrado na primeira leitura
+            compact_every: Número de correções gravadas entre compactações automáticas
+        """
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self.lock = FileLock(path)
+        self.corrupted_lines = 0
+        self._appends_since_compaction = 0
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        """
+        Identifica a versão atual do arquivo, sem lê-lo.
+
+        Returns:
+            (data de modificação em ns, tamanho), ou None se o arquivo não existe.
+            Muda a cada correção gravada, por qualquer processo, e a cada compactação.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def stream(self) -> Iterator[Dict]:
+        """
+        Lê o histórico linha a linha.
+
+        Yields:
+            Correções na ordem em que foram gravadas
+        """
+        self.corrupted_lines = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    correction = json.loads(line)
+                except ValueError:
+                    self.corrupted_lines += 1
+                    continue
+                if not isinstance(correction, dict):
+                    self.corrupted_lines += 1
+                    continue
+                yield self._expand(correction)
+
+    def load(self) -> List[Dict]:
+        """
+        Carrega todo o histórico, migrando o arquivo JSON antigo se necessário.
+
+        Returns:
+            Lista de correções
+        """
+        if not os.path.exists(self.path) and os.path.exists(self.legacy_path):
+            return self._migrate_legacy()
+
+        corrections = list(self.stream())
+        if self.corrupted_lines:
+            print(f"⚠ {self.corrupted_lines} linha(s) corrompida(s) ignorada(s) no histórico de correções")
+            self.compact()
+        return corrections
+
+    def append(self, correction: Dict) -> None:
+        """
+        Grava uma correção no fim do log (O(1)) e força a escrita em disco.
+
+        Args:
+            correction: Correção a gravar
+        """
+        line = json.dumps(self._compress(correction), ensure_ascii=False) + '\n'
+        with self.lock:
+            with open(self.path, 'a+b') as f:
+                # Se a última escrita foi interrompida, começa em uma nova linha
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = '\n' + line
+                f.write(line.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._appends_since_compaction += 1
+        if self.compact_every and self._appends_since_compaction >= self.compact_every:
+            self.compact()
+
+    def compact(self, corrections: List[Dict] = None) -> None:
+        """
+        Reescreve o log de forma atômica, sem linhas corrompidas.
+
+        Args:
+            corrections: Histórico completo a gravar. Se None, relê o arquivo atual.
+        """
+        with self.lock:
+            if corrections is None:
+                corrections = list(self.stream())
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for correction in corrections:
+                    f.write(json.dumps(self._compress(correction), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        self._appends_since_compaction = 0
+        self.corrupted_lines = 0
+
+    def _migrate_legacy(self) -> List[Dict]:
+        """Converte o histórico JSON antigo para o formato JSONL."""
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                corrections = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Não foi possível ler o histórico antigo ({self.legacy_path}): {e}")
+            return []
+        if not isinstance(corrections, list):
+            return []
+
+        corrections = [self._expand(c) for c in corrections if isinstance(c, dict)]
+        self.compact(corrections)
+        print(f"✓ Histórico migrado para {self.path} ({len(corrections)} correções)")
+        return corrections
+
+    @staticmethod
+    def _compress(correction: Dict) -> Dict:
+        """Remove o trecho inicial quando ele pode ser derivado do texto completo."""
+        if correction.get('text_full'):
+            return {k: v for k, v in correction.items() if k != 'text_snippet'}
+        return correction
+
+    @staticmethod
+    def _expand(correction: Dict) -> Dict:
+        """Recompõe o trecho inicial a partir do texto completo."""
+        if correction.get('text_full') and 'text_snippet' not in correction:
+            correction['text_snippet'] = correction['text_full'][:SNIPPET_LENGTH]
+        return correction
@@ -0,0 +1,77 @@
+"""
+Índice por documento para os extratores inteligentes do AIService.
+
+O texto é convertido para minúsculas uma única vez e as posições de todas as
+palavras-chave de um conjunto são encontradas em uma só passada (uma única
+expressão com todas as palavras, que encontra inclusive ocorrências sobrepostas).
+"Há palavra-chave a até N caracteres?" custa então uma busca binária nas posições.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+
+def fold_case(text: str) -> str:
+    """
+    Converte para minúsculas mantendo as posições de cada caractere.
+
+    `str.lower()` pode aumentar o texto (por exemplo, "İ"); nesses casos cada
+    caractere é convertido separadamente, mantendo apenas o primeiro resultado.
+    """
+    folded = text.lower()
+    if len(folded) != len(text):
+        folded = ''.join(char.lower()[0] for char in text)
+    return folded
+
+
+class KeywordSet:
+    """Conjunto de palavras-chave (em minúsculas) procurado de uma só vez."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keyword.lower() for keyword in keywords)
+        alternatives = '|'.join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        # O lookahead encontra uma ocorrência em cada posição, mesmo sobrepostas
+        self._pattern = re.compile(f'(?=({alternatives}))')
+
+    def find(self, folded_text: str) -> List[Tuple[int, int]]:
+        """Retorna (início, fim) de cada ocorrência, em ordem de início."""
+        return [(m.start(), m.start() + len(m.group(1))) for m in self._pattern.finditer(folded_text)]
+
+
+class _KeywordHits:
+    """Ocorrências de um KeywordSet em um documento."""
+
+    def __init__(self, hits: List[Tuple[int, int]]):
+        self.starts = [start for start, _ in hits]
+        # min_end[i]: menor fim entre as ocorrências que começam em starts[i] ou depois
+        self.min_end = [end for _, end in hits]
+        for i in range(len(self.min_end) - 2, -1, -1):
+            self.min_end[i] = min(self.min_end[i], self.min_end[i + 1])
+
+
+class DocumentIndex:
+    """Ocorrências de palavras-chave de um texto, calculadas uma vez."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.folded = fold_case(text)
+        self._hits: Dict[int, _KeywordHits] = {}
+
+    def has_keyword_near(self, keywords: KeywordSet, start: int, end: int, distance: int) -> bool:
+        """
+        Indica se alguma palavra-chave do conjunto está inteiramente no trecho
+        de `distance` caracteres antes de `start` até `distance` depois de `end`.
+        """
+        hits = self._hits_for(keywords)
+        window_start = max(0, start - distance)
+        window_end = min(len(self.text), end + distance)
+        first = bisect_left(hits.starts, window_start)
+        return first < len(hits.starts) and hits.min_end[first] <= window_end
+
+    def _hits_for(self, keywords: KeywordSet) -> _KeywordHits:
+        hits = self._hits.get(id(keywords))
+        if hits is None:
+            hits = _KeywordHits(keywords.find(self.folded))
+            self._hits[id(keywords)] = hits
+        return hits
@@ -0,0 +1,326 @@
+import json
+import os
+import threading
+from datetime import date, datetime
+
+from .certificate_index import parse_date, parse_date_range
+from .excel_service import COLUMN_HEADERS, ExcelService
+from .file_lock import FileLock
+from .metrics_service import timed
+
+
+CATALOG_NAME = "catalog.json"
+PARTITION_PREFIX = "atestados"
+SCHEMES = ("month", "rows")
+DATE_SOURCES = ("emission", "processing")
+
+
+class PartitionedExcelService:
+    """
+    Stores certificates in several workbooks instead of one ever-growing file.
+
+    Each write only loads and saves the workbook of its partition, so the
+    cost of a write depends on the partition size, not on the whole history.
+    Partitions are either one workbook per month (by emission date, or by
+    processing date when the emission date is missing or ``date_source`` is
+    "processing") or one workbook per ``max_rows`` rows.
+
+    ``catalog.json`` in the partition directory lists every partition with its
+    row count and emission date range. A pre-existing single spreadsheet
+    (``atestados.xlsx``) is registered as a read-only legacy partition, so
+    reads and queries still cover it. The class exposes the same read/write
+    methods as ExcelService, so it can be wrapped by BufferedExcelWriter.
+    """
+
+    def __init__(self, directory="atestados", scheme="month", max_rows=5000,
+                 date_source="emission", legacy_filename="atestados.xlsx"):
+        """
+        Initialize the partitioned store.
+
+        Args:
+            directory: Directory of the partitions and catalog (relative to the
+                package root unless absolute)
+            scheme: "month" (one workbook per month) or "rows" (one workbook
+                per ``max_rows`` rows)
+            max_rows: Rows per workbook with the "rows" scheme
+            date_source: "emission" (emission date, falling back to today) or
+                "processing" (always today) for the "month" scheme
+            legacy_filename: Single spreadsheet written before partitioning,
+                registered in the catalog if it exists (None to ignore)
+        """
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown partitioning scheme: {scheme}")
+        if date_source not in DATE_SOURCES:
+            raise ValueError(f"Unknown partition date source: {date_source}")
+        package_root = os.path.dirname(os.path.dirname(__file__))
+        self.directory = os.path.join(package_root, directory)
+        self.scheme = scheme
+        self.max_rows = max_rows
+        self.date_source = date_source
+        self.catalog_path = os.path.join(self.directory, CATALOG_NAME)
+        self.column_headers = list(COLUMN_HEADERS)
+        os.makedirs(self.directory, exist_ok=True)
+        # Serializes catalog updates (and partition choice) across threads and processes
+        self.lock = FileLock(self.catalog_path)
+        self._services = {}
+        self._services_lock = threading.Lock()
+
+        if legacy_filename:
+            self._register_legacy(os.path.join(package_root, legacy_filename))
+
+    def save_data(self, data):
+        """
+        Save one record to its partition.
+
+        Args:
+            data: Dictionary with medical certificate information
+        """
+        self.save_rows([data])
+
+    def save_rows(self, rows):
+        """
+        Append several records, with one workbook save per partition touched.
+
+        Args:
+            rows: List of dictionaries with medical certificate information
+        """
+        if not rows:
+            return
+
+        with self.lock:
+            catalog = self.load_catalog()
+            groups = {}
+            for data in rows:
+                name = self._partition_for(data, catalog, groups)
+                groups.setdefault(name, []).append(data)
+
+            for name, group in groups.items():
+                entry = self._entry(catalog, name)
+                self._service(entry["file"]).save_rows(group)
+                entry["rows"] += len(group)
+                for data in group:
+                    self._extend_dates(entry, parse_date(data.get("Data de Emissão")))
+                entry["updated"] = datetime.now().isoformat(timespec="seconds")
+
+            self._write_catalog(catalog)
+
+    def get_all_data(self):
+        """
+        Read the records of every partition, oldest partition first.
+
+        Returns:
+            list: List of dictionaries containing all records
+        """
+        data = []
+        for entry in self.partitions():
+            data.extend(self._service(entry["file"]).get_all_data())
+        return data
+
+    def query(self, cid=None, doctor=None, date_from=None, date_to=None, offset=0, limit=50):
+        """
+        Return one page of records matching the filters, across all partitions.
+
+        Partitions whose emission date range does not overlap the requested
+        range are skipped without being read. See ``ExcelService.query``.
+
+        Returns:
+            dict: ``total``, ``offset``, ``limit`` and ``items`` (each with its
+            ``partition`` name and ``row`` number in that partition)
+
+        Raises:
+            ValueError: If a date filter cannot be parsed
+        """
+        start, end = parse_date_range(date_from, date_to)
+        matches = []
+        for entry in self.partitions():
+            if not self._overlaps(entry, start, end):
+                continue
+            rows = self._service(entry["file"]).index.match(
+                cid=cid, doctor=doctor, date_from=start, date_to=end
+            )
+            if rows:
+                matches.append((entry["name"], rows))
+
+        total = sum(len(rows) for _, rows in matches)
+        items = []
+        skip = offset
+        for name, rows in matches:
+            if len(items) >= limit:
+                break
+            if skip >= len(rows):
+                skip -= len(rows)
+                continue
+            for row in rows[skip:skip + limit - len(items)]:
+                item = dict(row)
+                item["partition"] = name
+                items.append(item)
+            skip = 0
+
+        return {"total": total, "offset": offset, "limit": limit, "items": items}
+
+    def merge(self, output, date_from=None, date_to=None):
+        """
+        Write every record (optionally only partitions overlapping a date
+        range) to a single workbook.
+
+        Rows are streamed from each partition and written in write-only mode,
+        so memory use does not grow with the history.
+
+        Args:
+            output: Path of the combined workbook
+            date_from: First emission date of the partitions to include
+            date_to: Last emission date of the partitions to include
+
+        Returns:
+            int: Number of rows written
+        """
+        from openpyxl import Workbook, load_workbook
+
+        start, end = parse_date_range(date_from, date_to)
+        written = 0
+        with timed("excel_merge"):
+            combined = Workbook(write_only=True)
+            sheet = combined.create_sheet("Atestados")
+            sheet.append(self.column_headers)
+            for entry in self.partitions():
+                path = self._path(entry["file"])
+                if not self._overlaps(entry, start, end) or not os.path.exists(path):
+                    continue
+                with self._service(entry["file"]).lock:
+                    wb = load_workbook(path, read_only=True)
+                    try:
+                        for row in wb.active.iter_rows(min_row=2, values_only=True):
+                            if any(cell for cell in row):  # Skip empty rows
+                                sheet.append(list(row[:len(self.column_headers)]))
+                                written += 1
+                    finally:
+                        wb.close()
+            combined.save(output)
+        return written
+
+    def partitions(self):
+        """
+        List the partitions in the catalog.
+
+        Returns:
+            list: Catalog entries (legacy first, then by name)
+        """
+        return self.load_catalog()["partitions"]
+
+    def load_catalog(self):
+        """
+        Read the catalog.
+
+        Returns:
+            dict: ``partitions`` with ``name``, ``file``, ``rows``,
+            ``first_date``/``last_date`` (emission dates, ISO format) and
+            ``legacy`` for each partition
+        """
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+        except FileNotFoundError:
+            catalog = {"version": 1, "partitions": []}
+        catalog["partitions"].sort(key=lambda entry: (not entry.get("legacy"), entry["name"]))
+        return catalog
+
+    def file_exists(self):
+        """
+        Check if any partition has been written.
+
+        Returns:
+            bool: True if at least one partition file exists
+        """
+        return any(os.path.exists(self._path(entry["file"])) for entry in self.partitions())
+
+    def _partition_for(self, data, catalog, groups):
+        if self.scheme == "rows":
+            writable = [entry for entry in catalog["partitions"] if not entry.get("legacy")]
+            if writable:
+                current = writable[-1]
+                if current["rows"] + len(groups.get(current["name"], [])) < self.max_rows:
+                    return current["name"]
+            name = f"{PARTITION_PREFIX}-{len(writable) + 1:04d}"
+            self._entry(catalog, name)
+            return name
+
+        when = None
+        if self.date_source == "emission":
+            when = parse_date(data.get("Data de Emissão"))
+        when = when or date.today()
+        return f"{PARTITION_PREFIX}-{when.year:04d}-{when.month:02d}"
+
+    def _entry(self, catalog, name):
+        for entry in catalog["partitions"]:
+            if entry["name"] == name:
+                return entry
+        entry = {
+            "name": name,
+            "file": f"{name}.xlsx",
+            "rows": 0,
+            "first_date": None,
+            "last_date": None,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        catalog["partitions"].append(entry)
+        return entry
+
+    def _register_legacy(self, legacy_path):
+        if not os.path.exists(legacy_path):
+            return
+        with self.lock:
+            catalog = self.load_catalog()
+            if any(entry.get("legacy") for entry in catalog["partitions"]):
+                return
+            catalog["partitions"].append({
+                "name": "legacy",
+                "file": os.path.relpath(legacy_path, self.directory),
+                "rows": None,
+                "first_date": None,
+                "last_date": None,
+                "legacy": True,
+            })
+            self._write_catalog(catalog)
+            print(f"✓ Planilha {legacy_path} registrada no catálogo de partições")
+
+    def _write_catalog(self, catalog):
+        temp_path = f"{self.catalog_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.catalog_path)
+
+    def _service(self, file):
+        path = self._path(file)
+        with self._services_lock:
+            service = self._services.get(path)
+            if service is None:
+                service = ExcelService(path)
+                self._services[path] = service
+            return service
+
+    def _path(self, file):
+        return os.path.normpath(os.path.join(self.directory, file))
+
+    @staticmethod
+    def _extend_dates(entry, emitted):
+        if not emitted:
+            return
+        emitted = emitted.isoformat()
+        if not entry["first_date"] or emitted < entry["first_date"]:
+            entry["first_date"] = emitted
+        if not entry["last_date"] or emitted > entry["last_date"]:
+            entry["last_date"] = emitted
+
+    @staticmethod
+    def _overlaps(entry, start, end):
+        # Rows without a valid emission date never match a date filter, so the
+        # catalog range covers every row that can; legacy files have no range
+        if entry.get("legacy") or not (start or end):
+            return True
+        if not entry["first_date"]:
+            return False
+        if start and entry["last_date"] < start.isoformat():
+            return False
+        if end and entry["first_date"] > end.isoformat():
+            return False
+        return True
@@ -1,5 +1,18 @@
-from openpyxl import Workbook, load_workbook
+import atexit
 import os
+import threading
+
+from .certificate_index import CertificateIndex
+from .file_lock import FileLock
+from .metrics_service import timed
+
+
+COLUMN_HEADERS = [
+    "CID",
+    "Médico",
+    "Data de Emissão",
+    "Dias de Repouso",
+]
 
 
 class ExcelService:
@@ -14,12 +27,11 @@ class ExcelService:
         """
         package_root = os.path.dirname(os.path.dirname(__file__))
         self.filename = os.path.join(package_root, filename)
-        self.column_headers = [
-            "CID",
-            "Médico",
-            "Data de Emissão",
-            "Dias de Repouso",
-        ]
+        self.column_headers = list(COLUMN_HEADERS)
+        # Serializes writers across threads and processes
+        self.lock = FileLock(self.filename)
+        self._index = None
+        self._index_lock = threading.Lock()
     
     def save_data(self, data):
         """
@@ -29,29 +41,48 @@ class ExcelService:
             data: Dictionary with medical certificate information
                  Expected keys: CID, Médico, Data de Início, Dias de Afastamento
         """
-        if os.path.exists(self.filename):
-            wb = load_workbook(self.filename)
-            ws = wb.active
-        else:
-            wb = Workbook()
-            ws = wb.active
-            ws.append(self.column_headers)
+        self.save_rows([data])
+    
+    def save_rows(self, rows):
+        """
+        Append several records with a single workbook load and save.
+        
+        The file lock is held for the whole read-modify-write, so concurrent
+        writers (threads or processes) cannot lose each other's rows.
+        
+        Args:
+            rows: List of dictionaries with medical certificate information
+        """
+        if not rows:
+            return
+        
+        from openpyxl import Workbook, load_workbook
+        
+        with timed("excel_write"), self.lock:
+            if os.path.exists(self.filename):
+                wb = load_workbook(self.filename)
+                ws = wb.active
+            else:
+                wb = Workbook()
+                ws = wb.active
+                ws.append(self.column_headers)
 
-        # Ensure header reflects the latest structure
-        if ws.max_row >= 1:
-            existing_headers = [cell.value for cell in ws[1]]
-            if existing_headers != self.column_headers:
-                for idx, header in enumerate(self.column_headers, start=1):
-                    ws.cell(row=1, column=idx, value=header)
-        
-        ws.append([
-            data.get("CID", ""),
-            data.get("Médico", ""),
-            data.get("Data de Emissão", ""),
-            data.get("Dias de Repouso", ""),
-        ])
-        
-        wb.save(self.filename)
+            # Ensure header reflects the latest structure
+            if ws.max_row >= 1:
+                existing_headers = [cell.value for cell in ws[1]]
+                if existing_headers != self.column_headers:
+                    for idx, header in enumerate(self.column_headers, start=1):
+                        ws.cell(row=1, column=idx, value=header)
+            
+            for data in rows:
+                ws.append([
+                    data.get("CID", ""),
+                    data.get("Médico", ""),
+                    data.get("Data de Emissão", ""),
+                    data.get("Dias de Repouso", ""),
+                ])
+            
+            wb.save(self.filename)
     
     def get_all_data(self):
         """
@@ -63,23 +94,63 @@ class ExcelService:
         if not os.path.exists(self.filename):
             return []
         
-        wb = load_workbook(self.filename)
+        from openpyxl import load_workbook
+        
+        # Read-only mode streams the rows instead of loading every cell
+        wb = load_workbook(self.filename, read_only=True)
         ws = wb.active
         
         data = []
-        # Skip header row
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if any(cell for cell in row):  # Skip empty rows
-                values = list(row)
-                data.append({
-                    "CID": values[0] if len(values) > 0 else "",
-                    "Médico": values[1] if len(values) > 1 else "",
-                    "Data de Emissão": values[2] if len(values) > 2 else "",
-                    "Dias de Repouso": values[3] if len(values) > 3 else "",
-                })
+        try:
+            # Skip header row
+            for row in ws.iter_rows(min_row=2, values_only=True):
+                if any(cell for cell in row):  # Skip empty rows
+                    values = list(row)
+                    data.append({
+                        "CID": values[0] if len(values) > 0 else "",
+                        "Médico": values[1] if len(values) > 1 else "",
+                        "Data de Emissão": values[2] if len(values) > 2 else "",
+                        "Dias de Repouso": values[3] if len(values) > 3 else "",
+                    })
+        finally:
+            wb.close()
         
         return data
     
+    def query(self, cid=None, doctor=None, date_from=None, date_to=None, offset=0, limit=50):
+        """
+        Return one page of stored records matching the given filters.
+        
+        Uses an index over the spreadsheet that is rebuilt only when the file
+        changes (see ``CertificateIndex``). Rows still queued in a
+        ``BufferedExcelWriter`` are not visible until they are flushed.
+        
+        Args:
+            cid: CID prefix (e.g. "J1")
+            doctor: Doctor name (case-insensitive exact match)
+            date_from: First emission date (inclusive)
+            date_to: Last emission date (inclusive)
+            offset: Matching rows to skip
+            limit: Maximum rows returned
+        
+        Returns:
+            dict: ``total``, ``offset``, ``limit`` and ``items``
+        
+        Raises:
+            ValueError: If a date filter cannot be parsed
+        """
+        return self.index.query(
+            cid=cid, doctor=doctor, date_from=date_from, date_to=date_to, offset=offset, limit=limit
+        )
+    
+    @property
+    def index(self):
+        """CertificateIndex over this spreadsheet (created on first use)."""
+        with self._index_lock:
+            if self._index is None:
+                self._index = CertificateIndex(self)
+            return self._index
+    
     def create_file(self):
         """
         Create a new Excel file with headers.
@@ -88,6 +159,8 @@ class ExcelService:
             bool: True if successful, False otherwise
         """
         try:
+            from openpyxl import Workbook
+            
             wb = Workbook()
             ws = wb.active
             ws.append(self.column_headers)
@@ -107,6 +180,124 @@ class ExcelService:
         return os.path.exists(self.filename)
 
 
+class BufferedExcelWriter:
+    """
+    Queues rows in memory and writes them to the spreadsheet in batches.
+    
+    A batch is flushed when ``batch_size`` rows are pending, when
+    ``flush_interval`` seconds have passed since the last flush, on
+    ``flush()`` and at interpreter shutdown. Each flush is a single
+    ``ExcelService.save_rows`` call under the inter-process file lock.
+    Callers that must know when their rows are on disk pass ``on_saved``
+    to ``save_rows``; it runs after the flush containing them succeeds.
+    """
+    
+    def __init__(self, excel_service, batch_size=50, flush_interval=2.0):
+        """
+        Initialize the writer and start its background flush thread.
+        
+        Args:
+            excel_service: ExcelService that owns the spreadsheet
+            batch_size: Pending rows that trigger an immediate flush
+            flush_interval: Maximum seconds a row waits before being written
+        """
+        self.excel_service = excel_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._on_saved = []
+        self._rows_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="excel-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    @property
+    def pending(self):
+        """Number of rows waiting to be written."""
+        with self._rows_lock:
+            return len(self._rows)
+    
+    def save_data(self, data):
+        """
+        Queue a record for writing (drop-in for ``ExcelService.save_data``).
+        
+        Args:
+            data: Dictionary with medical certificate information
+        """
+        self.save_rows([data])
+    
+    def save_rows(self, rows, on_saved=None):
+        """
+        Queue several records for writing.
+        
+        Args:
+            rows: List of dictionaries with medical certificate information
+            on_saved: Optional callable run (without arguments) once the
+                rows have been written to the spreadsheet
+        """
+        if self._closed:
+            self.excel_service.save_rows(rows)
+            if on_saved is not None:
+                on_saved()
+            return
+        with self._rows_lock:
+            self._rows.extend(rows)
+            if on_saved is not None:
+                self._on_saved.append(on_saved)
+            pending = len(self._rows)
+        if pending >= self.batch_size:
+            self._wake.set()
+    
+    def flush(self):
+        """
+        Write all pending rows now.
+        
+        Returns:
+            int: Number of rows written
+        """
+        with self._flush_lock:
+            with self._rows_lock:
+                rows, self._rows = self._rows, []
+                callbacks, self._on_saved = self._on_saved, []
+            if not rows:
+                return 0
+            try:
+                self.excel_service.save_rows(rows)
+            except Exception:
+                # Keep the rows so the next flush retries them
+                with self._rows_lock:
+                    self._rows[:0] = rows
+                    self._on_saved[:0] = callbacks
+                raise
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error after writing Excel batch: {e}")
+            return len(rows)
+    
+    def close(self):
+        """Stop the background thread and write the remaining rows."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+    
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing Excel batch: {e}")
+
+
 # Legacy function for backward compatibility
 def save_to_excel(data, filename="atestados.xlsx"):
     """Legacy function wrapper for backward compatibility."""
@@ -0,0 +1,227 @@
+"""
+Motor de extração compartilhado por todo o processo.
+
+Mantém uma única instância de AIService (com o modelo BERT já carregado) e de
+NLPService (com as regex já compiladas), evitando reconstruí-las a cada
+atestado processado.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .metrics_service import timed
+from .nlp_service import NLPService
+
+
+FIELDS = ['CID', 'Médico', 'Data de Emissão', 'Dias de Repouso']
+
+NOT_FOUND_MARKERS = ('não foi encontrado', 'não foram encontrados')
+
+
+def is_found(value: str) -> bool:
+    """Indica se o valor extraído é um resultado válido (e não uma mensagem de erro)."""
+    return bool(value) and not any(marker in value for marker in NOT_FOUND_MARKERS)
+
+
+class ExtractionEngine:
+    """
+    Motor de extração de longa duração.
+
+    Deve ser criado uma vez (em `create_app`) e aquecido com `warm_up()` antes
+    de atender requisições. Todas as requisições compartilham a mesma instância.
+
+    Com `warm_up(background_model=True)`, o motor fica pronto assim que o
+    histórico de correções é carregado e o modelo BERT é carregado em uma
+    thread; até lá, as extrações usam os padrões inteligentes do AIService.
+    """
+
+    def __init__(self, use_ai: bool = True, use_advanced_nlp: bool = True,
+                 model_backend: str = "pytorch", onnx_model_path: Optional[str] = None,
+                 result_cache_size: int = 256):
+        """
+        Inicializa o motor sem carregar modelos.
+
+        Args:
+            use_ai: Se True, usa o AIService além do método tradicional
+            use_advanced_nlp: Se True, tenta carregar o modelo BERT no aquecimento
+            model_backend: Backend de inferência do BERT ("pytorch" ou "onnx")
+            onnx_model_path: Pasta do modelo ONNX quantizado (backend "onnx")
+            result_cache_size: Resultados do AIService guardados em memória (0 desativa)
+        """
+        self.use_ai = use_ai
+        self.use_advanced_nlp = use_advanced_nlp
+        self.model_backend = model_backend
+        self.onnx_model_path = onnx_model_path
+        self.result_cache_size = result_cache_size
+        self.nlp_service = NLPService()
+        self.ai_service = None
+        self.warm_up_error = None
+        self.warm_up_seconds = None
+        self.model_load_seconds = None
+        self._ready = threading.Event()
+        self._model_done = threading.Event()
+        self._lock = threading.Lock()
+
+    def warm_up(self, background_model: bool = False) -> "ExtractionEngine":
+        """
+        Carrega o AIService (modelo, histórico de correções) e executa uma
+        inferência de aquecimento. Chamadas repetidas não têm efeito.
+
+        Args:
+            background_model: Se True, retorna assim que o histórico é
+                carregado e carrega o modelo BERT em uma thread separada
+        """
+        with self._lock:
+            if self._ready.is_set():
+                return self
+
+            start = time.perf_counter()
+            if self.use_ai:
+                try:
+                    from .ai_service import AIService
+                    self.ai_service = AIService(
+                        use_advanced_nlp=self.use_advanced_nlp,
+                        load_model=False,
+                        model_backend=self.model_backend,
+                        onnx_model_path=self.onnx_model_path,
+                        result_cache_size=self.result_cache_size,
+                    )
+                except Exception as e:
+                    print(f"⚠ Erro ao carregar IA, usando método tradicional: {e}")
+                    self.ai_service = None
+                    self.warm_up_error = str(e)
+
+            self.warm_up_seconds = time.perf_counter() - start
+            self._ready.set()
+            print(f"✓ Motor de extração pronto em {self.warm_up_seconds:.2f}s")
+
+        if not (self.ai_service and self.use_advanced_nlp):
+            self._model_done.set()
+        elif background_model:
+            threading.Thread(target=self._load_model, name="model-warm-up", daemon=True).start()
+        else:
+            self._load_model()
+        return self
+
+    def _load_model(self) -> None:
+        """Carrega o modelo BERT e executa a inferência de aquecimento."""
+        start = time.perf_counter()
+        try:
+            self.ai_service.load_model()
+            self.ai_service.warm_up()
+        except Exception as e:
+            print(f"⚠ Erro ao carregar modelo, usando padrões inteligentes: {e}")
+            self.warm_up_error = str(e)
+        finally:
+            self.model_load_seconds = time.perf_counter() - start
+            self._model_done.set()
+            print(f"✓ Carregamento do modelo concluído em {self.model_load_seconds:.2f}s")
+
+    def wait_for_model(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda o fim do carregamento do modelo; retorna False se expirar."""
+        return self._model_done.wait(timeout)
+
+    def is_ready(self) -> bool:
+        """Indica se o aquecimento já foi concluído."""
+        return self._ready.is_set()
+
+    def status(self) -> Dict[str, object]:
+        """Retorna o estado do motor para o endpoint de prontidão."""
+        return {
+            'ready': self.is_ready(),
+            'ai_enabled': self.ai_service is not None,
+            'bert_loaded': bool(self.ai_service and self.ai_service.nlp_model),
+            'model_backend': self.model_backend,
+            'model_loading': self.is_ready() and not self._model_done.is_set(),
+            'warm_up_seconds': self.warm_up_seconds,
+            'model_load_seconds': self.model_load_seconds,
+            'error': self.warm_up_error,
+        }
+
+    def extract(self, text: str, use_ai: bool = True) -> Dict[str, str]:
+        """
+        Extrai informações usando IA quando disponível, com fallback para método tradicional.
+
+        Args:
+            text: Texto extraído do OCR
+            use_ai: Se True, tenta usar IA primeiro
+
+        Returns:
+            Dicionário com informações extraídas
+        """
+        return self.extract_many([text], use_ai=use_ai)[0]
+
+    def extract_many(self, texts: List[str], use_ai: bool = True) -> List[Dict[str, str]]:
+        """
+        Extrai informações de vários textos de uma vez.
+
+        A inferência do BERT de todos os textos é feita em uma única chamada em
+        lote, o que é bem mais eficiente em CPU do que um texto por vez.
+
+        Args:
+            texts: Textos extraídos do OCR
+            use_ai: Se True, tenta usar IA primeiro
+
+        Returns:
+            Lista de dicionários com informações extraídas, na mesma ordem
+        """
+        if not self.is_ready():
+            self.warm_up()
+
+        with timed("regex_extraction"):
+            traditional_results = [self.nlp_service.extract_info(text) for text in texts]
+        if not (use_ai and self.use_ai and self.ai_service):
+            return traditional_results
+
+        try:
+            with timed("ai_extraction"):
+                ai_results = self.ai_service.extract_many(texts)
+        except Exception as e:
+            print(f"⚠ Erro ao usar IA, usando método tradicional: {e}")
+            return traditional_results
+
+        # Combina resultados da IA com método tradicional para maior precisão
+        return [
+            self._combine(ai, traditional)
+            for ai, traditional in zip(ai_results, traditional_results)
+        ]
+
+    @staticmethod
+    def _combine(ai_results: Dict[str, str], traditional_results: Dict[str, str]) -> Dict[str, str]:
+        """Prefere resultados da IA quando disponíveis e válidos."""
+        final_results = {}
+        for key in FIELDS:
+            ai_value = ai_results.get(key, '')
+            trad_value = traditional_results.get(key, '')
+
+            if is_found(ai_value):
+                final_results[key] = ai_value
+            elif is_found(trad_value):
+                final_results[key] = trad_value
+            else:
+                # Usa o valor da IA como fallback (mesmo que seja mensagem de erro)
+                final_results[key] = ai_value if ai_value else trad_value
+
+        return final_results
+
+
+_engine: Optional[ExtractionEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> ExtractionEngine:
+    """Retorna o motor compartilhado do processo, criando-o se necessário."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ExtractionEngine()
+    return _engine
+
+
+def set_engine(engine: ExtractionEngine) -> None:
+    """Define o motor compartilhado do processo (usado por `create_app`)."""
+    global _engine
+    with _engine_lock:
+        _engine = engine
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+
+class FileLock:
+    """
+    Inter-process lock backed by a lock file next to the protected resource.
+
+    Uses ``fcntl.flock`` on POSIX and ``msvcrt.locking`` on Windows. The lock is
+    re-entrant within a thread, so nested ``with`` blocks on the same instance
+    do not deadlock.
+    """
+
+    def __init__(self, path, timeout=30.0, poll_interval=0.05):
+        """
+        Initialize the lock.
+
+        Args:
+            path: Path of the resource to protect (the lock file is ``path + '.lock'``)
+            timeout: Seconds to wait for the lock before raising TimeoutError
+            poll_interval: Seconds between acquisition attempts on Windows
+        """
+        self.lock_path = f"{path}.lock"
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._thread_lock = threading.RLock()
+        self._handle = None
+        self._depth = 0
+
+    def acquire(self):
+        """
+        Acquire the lock, blocking up to ``timeout`` seconds.
+
+        Raises:
+            TimeoutError: If the lock could not be acquired in time
+        """
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Timeout waiting for lock: {self.lock_path}")
+        if self._depth:
+            self._depth += 1
+            return
+
+        handle = open(self.lock_path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                try:
+                    self._lock_handle(handle)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timeout waiting for lock: {self.lock_path}")
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            handle.close()
+            self._thread_lock.release()
+            raise
+
+        self._handle = handle
+        self._depth = 1
+
+    def release(self):
+        """Release the lock."""
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                self._unlock_handle(self._handle)
+            finally:
+                self._handle.close()
+                self._handle = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    if os.name == "nt":
+        @staticmethod
+        def _lock_handle(handle):
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+
+        @staticmethod
+        def _unlock_handle(handle):
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        @staticmethod
+        def _lock_handle(handle):
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        @staticmethod
+        def _unlock_handle(handle):
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
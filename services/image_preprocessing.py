@@ -0,0 +1,163 @@
+from .metrics_service import timed
+
+
+# Long side of an A4 page, used to turn a target DPI into a pixel size for
+# photos whose physical size is unknown
+A4_LONG_SIDE_INCHES = 11.69
+
+
+def otsu_threshold(histogram):
+    """
+    Compute Otsu's binarization threshold from a 256-bin grayscale histogram.
+
+    Args:
+        histogram: Pixel counts per gray level (``Image.histogram()`` of an "L" image)
+
+    Returns:
+        int: Gray level; pixels at or below it are considered ink
+    """
+    total = sum(histogram)
+    sum_total = sum(level * count for level, count in enumerate(histogram))
+    sum_background = 0.0
+    weight_background = 0
+    best_variance = 0.0
+    threshold = 0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_total - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            threshold = level
+    return threshold
+
+
+class ImagePreprocessor:
+    """Normalizes certificate images before OCR so Tesseract reads fewer, cleaner pixels."""
+
+    def __init__(self, target_dpi=200, grayscale=True, binarize=True, crop_borders=True, border_margin=20):
+        """
+        Initialize the preprocessor.
+
+        Args:
+            target_dpi: Effective DPI of the page after downscaling, assuming the
+                image shows an A4 page (None disables downscaling). The default
+                of 200 reduces a 12 MP phone photo to about 0.59x its sides
+            grayscale: Convert the image to grayscale
+            binarize: Convert the image to black and white (Otsu threshold)
+            crop_borders: Remove empty (light) borders around the content
+            border_margin: Pixels kept around the content when cropping
+        """
+        self.target_dpi = target_dpi
+        self.grayscale = grayscale
+        self.binarize = binarize
+        self.crop_borders = crop_borders
+        self.border_margin = border_margin
+
+    def settings(self):
+        """
+        Settings that change the preprocessed image (and therefore the OCR output).
+
+        Returns:
+            dict: Preprocessing options
+        """
+        return {
+            "target_dpi": self.target_dpi,
+            "grayscale": self.grayscale,
+            "binarize": self.binarize,
+            "crop_borders": self.crop_borders,
+            "border_margin": self.border_margin,
+        }
+
+    def target_size(self, size):
+        """
+        Pixel size for an image of ``size`` at the target DPI.
+
+        Args:
+            size: (width, height) of the original image
+
+        Returns:
+            tuple: (width, height), never larger than the original
+        """
+        width, height = size
+        if not self.target_dpi:
+            return size
+        scale = self.target_dpi * A4_LONG_SIDE_INCHES / max(width, height)
+        if scale >= 1:
+            return size
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def prepare(self, image):
+        """
+        Run the configured steps on an image opened with ``Image.open``.
+
+        JPEG images are decoded in draft mode, directly at a reduced scale (and
+        in grayscale when requested), which avoids decoding every pixel of a
+        large phone photo. Each step is timed as ``preprocess_<step>``.
+
+        Args:
+            image: PIL image, not yet loaded
+
+        Returns:
+            PIL.Image.Image: Image ready for Tesseract
+        """
+        from PIL import Image
+
+        want_gray = self.grayscale or self.binarize
+        size = self.target_size(image.size)
+
+        with timed("preprocess_decode"):
+            if size != image.size and image.format == "JPEG":
+                image.draft("L" if want_gray else "RGB", size)
+            image.load()
+
+        if image.size != size:
+            with timed("preprocess_resize"):
+                # Draft mode decodes at 1/2, 1/4 or 1/8 scale, so the result may
+                # still be larger than the target
+                image = image.resize(self.target_size(image.size), Image.LANCZOS)
+
+        gray = None
+        if want_gray or self.crop_borders:
+            with timed("preprocess_grayscale"):
+                gray = image if image.mode == "L" else image.convert("L")
+            if want_gray:
+                image = gray
+
+        threshold = None
+        if self.binarize or self.crop_borders:
+            threshold = otsu_threshold(gray.histogram())
+
+        if self.binarize:
+            with timed("preprocess_binarize"):
+                image = gray.point([0 if level <= threshold else 255 for level in range(256)])
+
+        if self.crop_borders:
+            with timed("preprocess_crop"):
+                image = self._crop(image, gray, threshold)
+
+        return image
+
+    def _crop(self, image, gray, threshold):
+        ink = gray.point([255 if level <= threshold else 0 for level in range(256)])
+        bbox = ink.getbbox()
+        if not bbox:
+            return image
+        left, top, right, bottom = bbox
+        margin = self.border_margin
+        bbox = (
+            max(0, left - margin),
+            max(0, top - margin),
+            min(image.width, right + margin),
+            min(image.height, bottom + margin),
+        )
+        if bbox == (0, 0, image.width, image.height):
+            return image
+        return image.crop(bbox)
@@ -0,0 +1,125 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue has reached its capacity."""
+
+
+class Job:
+    """State of a single background processing job."""
+
+    def __init__(self, job_id, description=None):
+        self.id = job_id
+        self.description = description
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def to_dict(self):
+        """Return a JSON-serializable view of the job state."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "description": self.description,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobService:
+    """Bounded background worker pool for long-running processing jobs."""
+
+    def __init__(self, max_workers=2, max_pending=32, result_ttl=3600):
+        """
+        Initialize the job service.
+
+        Args:
+            max_workers: Number of worker threads processing jobs
+            max_pending: Maximum number of queued plus running jobs
+            result_ttl: Seconds a finished job is kept before being discarded
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, description=None, **kwargs):
+        """
+        Queue ``func(*args, **kwargs)`` for background execution.
+
+        Args:
+            func: Callable to run
+            description: Optional label stored with the job (e.g. file name)
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            QueueFullError: If ``max_pending`` jobs are already queued or running
+        """
+        with self._lock:
+            self._prune()
+            if self._active >= self.max_pending:
+                raise QueueFullError("Fila de processamento cheia. Tente novamente em instantes.")
+            job = Job(uuid.uuid4().hex, description)
+            self._jobs[job.id] = job
+            self._active += 1
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """
+        Return a job by id.
+
+        Args:
+            job_id: Identifier returned by ``submit``
+
+        Returns:
+            Job or None if unknown or expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and optionally wait for running ones."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, func, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = func(*args, **kwargs)
+            job.status = "done"
+        except Exception as exc:
+            job.error = str(exc)
+            job.status = "error"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+
+    def _prune(self):
+        """Drop finished jobs older than ``result_ttl``. Caller holds the lock."""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,219 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increment the counter.
+
+        Args:
+            amount: Value to add (must be non-negative)
+            **labels: Label values, one per label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value for a label set."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value (e.g. duration in seconds)
+            **labels: Label values, one per label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the counter ``name``, creating it on first use."""
+        return self._get_or_create(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Return the histogram ``name``, creating it on first use."""
+        return self._get_or_create(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format (0.0.4).
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+# Process-wide registry used by the services and exposed on /metrics
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "leitor_stage_duration_seconds",
+    "Duration of each processing stage in seconds.",
+    labelnames=("stage",),
+)
+REQUESTS_TOTAL = registry.counter(
+    "leitor_http_requests_total",
+    "HTTP requests handled, by endpoint and status code.",
+    labelnames=("endpoint", "status"),
+)
+ERRORS_TOTAL = registry.counter(
+    "leitor_errors_total",
+    "Processing errors, by stage.",
+    labelnames=("stage",),
+)
+PAGES_TOTAL = registry.counter(
+    "leitor_pages_processed_total",
+    "Document pages processed by OCR.",
+)
+PDF_PAGES_TOTAL = registry.counter(
+    "leitor_pdf_pages_total",
+    "PDF pages read, by source (embedded text layer or OCR).",
+    labelnames=("source",),
+)
+OCR_EARLY_EXITS_TOTAL = registry.counter(
+    "leitor_ocr_early_exits_total",
+    "PDFs whose OCR stopped before the last page because every field was found.",
+)
+OCR_RERUNS_TOTAL = registry.counter(
+    "leitor_ocr_reruns_total",
+    "Adaptive OCR fast-pass results read again at full DPI, by reason.",
+    labelnames=("reason",),
+)
+CACHE_HITS_TOTAL = registry.counter(
+    "leitor_cache_hits_total",
+    "Cache hits, by cache.",
+    labelnames=("cache",),
+)
+CACHE_MISSES_TOTAL = registry.counter(
+    "leitor_cache_misses_total",
+    "Cache misses, by cache.",
+    labelnames=("cache",),
+)
+
+
+def observe_stage(stage, seconds):
+    """Record the duration of a stage measured elsewhere (e.g. in a worker process)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time the enclosed block as ``stage``; exceptions are counted as errors.
+
+    Args:
+        stage: Stage name used as the ``stage`` label
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS_TOTAL.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
@@ -1,5 +1,5 @@
 import re
-from typing import Optional
+from typing import List, Optional
 
 
 class NLPService:
@@ -81,6 +81,36 @@ class NLPService:
         
         self.months_pt = months_pt
 
+        # Ordem efetiva de busca da data. O prefixo de emissão do padrão por
+        # extenso é opcional e não contém dígitos, portanto sua primeira
+        # ocorrência captura sempre a mesma data que o padrão genérico por
+        # extenso (mais barato). Este é usado no lugar daquele, e a segunda
+        # tentativa do padrão genérico por extenso (que falharia) é omitida.
+        self.date_search_order = (
+            [self.generic_date_patterns[0]]
+            + self.emission_patterns[1:]
+            + self.generic_date_patterns[1:]
+        )
+
+        # Código CID isolado (sem o prefixo "CID"), usado quando o código está
+        # em linha separada devido ao OCR
+        self.standalone_cid_pattern = re.compile(
+            r'\b([A-Z]\d{2,3}(?:\.[0-9A-Z]{1,2})?)\b',
+            re.IGNORECASE
+        )
+
+        # Palavras que indicam contexto médico para o último recurso de CID
+        self.medical_context = re.compile(
+            r'(?:doen[çc]a|diagn[oó]stico|cid|patologia|infec[çc][aã]o|sintoma)',
+            re.IGNORECASE
+        )
+
+        # Normalização do texto do OCR: espaços/tabs repetidos viram um único
+        # espaço e, em seguida, caracteres de controle são removidos. Espaços
+        # isolados já estão normalizados e não geram substituição.
+        self.spaces_pattern = re.compile(r'[ \t]{2,}|\t')
+        self.control_chars_pattern = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]')
+
         self.not_found_messages = {
             "cid": "CID não foi encontrado. Verifique se o texto está legível ou se segue o padrão CID-10 (ex.: J00, M54.5).",
             "doctor": "Nome do médico não foi encontrado. Certifique-se de que o prefixo 'Dr.' ou 'Dra.' esteja presente e legível.",
@@ -91,64 +121,77 @@ class NLPService:
     def extract_info(self, text: str) -> dict:
         """Retorna as informações principais do atestado com mensagens amigáveis."""
 
-        safe_text = text or ""
-        
-        # Normaliza espaços múltiplos e caracteres especiais que podem vir do OCR
-        # Substitui múltiplos espaços por um único espaço, preserva quebras de linha
-        safe_text = re.sub(r'[ \t]+', ' ', safe_text)
-        # Remove caracteres de controle que podem atrapalhar a regex
-        safe_text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]', '', safe_text)
-
-        cid = self.extract_cid(safe_text)
-        doctor = self.extract_doctor(safe_text)
-        emission_date = self.extract_emission_date(safe_text)
-        days = self.extract_days(safe_text)
+        fields = self.extract_fields(text)
+        cid = fields["cid"]
+        doctor = fields["doctor"]
+        emission_date = fields["date"]
 
         return {
             "CID": cid if cid else self.not_found_messages["cid"],
             "Médico": doctor if doctor else self.not_found_messages["doctor"],
             "Data de Emissão": emission_date if emission_date else self.not_found_messages["date"],
-            "Dias de Repouso": self._format_days(days),
+            "Dias de Repouso": self._format_days(fields["days"]),
         }
 
+    def extract_fields(self, text: str) -> dict:
+        """
+        Extrai os valores brutos de todos os campos em uma única passada de preparo.
+
+        O texto é normalizado uma vez e as linhas em maiúsculas são calculadas
+        uma vez; todos os extratores trabalham sobre esse mesmo texto, com as
+        regex já compiladas no construtor.
+
+        Returns:
+            Dicionário com as chaves cid, doctor, date e days (None quando ausentes)
+        """
+        safe_text = self.normalize(text)
+        upper_lines = safe_text.upper().split('\n')
+
+        return {
+            "cid": self._extract_cid(safe_text, upper_lines),
+            "doctor": self.extract_doctor(safe_text),
+            "date": self.extract_emission_date(safe_text),
+            "days": self.extract_days(safe_text),
+        }
+
+    def normalize(self, text: str) -> str:
+        """Normaliza espaços múltiplos e caracteres especiais que podem vir do OCR."""
+        # Substitui múltiplos espaços por um único espaço, preserva quebras de linha
+        safe_text = self.spaces_pattern.sub(' ', text or "")
+        # Remove caracteres de controle que podem atrapalhar a regex
+        return self.control_chars_pattern.sub('', safe_text)
+
     def extract_cid(self, text: str) -> Optional[str]:
+        return self._extract_cid(text, text.upper().split('\n'))
+
+    def _extract_cid(self, text: str, upper_lines: List[str]) -> Optional[str]:
         # Primeiro tenta o padrão com contexto "CID"
         match = self.cid_pattern.search(text)
         if match:
             return match.group("cid").upper()
         
-        # Se não encontrou, procura códigos CID em qualquer lugar do texto
-        # Padrão para códigos CID: letra maiúscula + 2-3 dígitos + opcional ponto + 1-2 dígitos/letras
-        # Mas apenas se não estiver no meio de uma palavra ou número maior
-        standalone_cid_pattern = re.compile(
-            r'\b([A-Z]\d{2,3}(?:\.[0-9A-Z]{1,2})?)\b',
-            re.IGNORECASE
-        )
-        
-        # Procurar códigos que podem ser CID
-        # CID geralmente está próximo de palavras como "CID", "diagnóstico", "doença", etc.
-        # ou em linhas isoladas
-        lines = text.split('\n')
-        for i, line in enumerate(lines):
-            line_upper = line.upper()
-            # Se a linha contém "CID" ou está próxima de uma linha com "CID"
-            if 'CID' in line_upper or (i > 0 and 'CID' in lines[i-1].upper()) or (i < len(lines)-1 and 'CID' in lines[i+1].upper()):
-                matches = standalone_cid_pattern.findall(line)
-                if matches:
-                    # Retorna o primeiro código encontrado próximo a "CID"
-                    return matches[0].upper()
+        # Se não encontrou, procura códigos CID nas linhas que contêm "CID"
+        # ou que são vizinhas de uma linha com "CID" (OCR costuma separar o
+        # código do rótulo). Retorna o primeiro código, na ordem das linhas.
+        last = len(upper_lines) - 1
+        candidate_lines = set()
+        for i, line_upper in enumerate(upper_lines):
+            if 'CID' in line_upper:
+                candidate_lines.update((max(i - 1, 0), i, min(i + 1, last)))
+        if candidate_lines:
+            lines = text.split('\n')
+            for i in sorted(candidate_lines):
+                match = self.standalone_cid_pattern.search(lines[i])
+                if match:
+                    return match.group(1).upper()
         
         # Como último recurso, procurar códigos CID em todo o texto
         # mas apenas se estiverem em contexto médico (perto de palavras como "doença", "diagnóstico", etc.)
-        medical_context = re.compile(
-            r'(?:doen[çc]a|diagn[oó]stico|cid|patologia|infec[çc][aã]o|sintoma)',
-            re.IGNORECASE
-        )
-        if medical_context.search(text):
-            matches = standalone_cid_pattern.findall(text)
-            if matches:
+        if self.medical_context.search(text):
+            match = self.standalone_cid_pattern.search(text)
+            if match:
                 # Retorna o primeiro código encontrado
-                return matches[0].upper()
+                return match.group(1).upper()
         
         return None
 
@@ -164,8 +207,8 @@ class NLPService:
         return None
 
     def extract_emission_date(self, text: str) -> Optional[str]:
-        # Tenta primeiro os padrões específicos de emissão
-        for pattern in self.emission_patterns:
+        # Tenta primeiro os padrões específicos de emissão, depois os genéricos
+        for pattern in self.date_search_order:
             match = pattern.search(text)
             if match:
                 # Verifica se é data por extenso (tem grupos day, month, year)
@@ -177,19 +220,6 @@ class NLPService:
                 elif "date" in match.groupdict():
                     return self._normalize_date(match.group("date"))
 
-        # Tenta padrões genéricos
-        for pattern in self.generic_date_patterns:
-            match = pattern.search(text)
-            if match:
-                # Verifica se é data por extenso
-                if "day" in match.groupdict():
-                    day = match.group("day").zfill(2)
-                    month = self.months_pt.get(match.group("month").lower(), "01")
-                    year = match.group("year")
-                    return f"{day}/{month}/{year}"
-                elif "date" in match.groupdict():
-                    return self._normalize_date(match.group("date"))
-
         return None
 
     def extract_days(self, text: str) -> Optional[int]:
@@ -229,45 +259,16 @@ def extract_info_with_ai(text: str, use_ai: bool = True) -> dict:
     """
     Extrai informações usando IA quando disponível, com fallback para método tradicional.
     
+    Usa o motor de extração compartilhado do processo (ver
+    `services/extraction_engine.py`), de modo que o modelo e as regex são
+    carregados uma única vez.
+
     Args:
         text: Texto extraído do OCR
         use_ai: Se True, tenta usar IA primeiro
-        
+
     Returns:
         Dicionário com informações extraídas
     """
-    if use_ai:
-        try:
-            from services.ai_service import AIService
-            ai_service = AIService(use_advanced_nlp=True)
-            ai_results = ai_service.extract_with_ai(text)
-            
-            # Combina resultados da IA com método tradicional para maior precisão
-            nlp = NLPService()
-            traditional_results = nlp.extract_info(text)
-            
-            # Prefere resultados da IA quando disponíveis e válidos
-            final_results = {}
-            for key in ['CID', 'Médico', 'Data de Emissão', 'Dias de Repouso']:
-                ai_value = ai_results.get(key, '')
-                trad_value = traditional_results.get(key, '')
-                
-                # Se IA encontrou algo válido, usa; senão tenta tradicional
-                if ai_value and 'não foi encontrado' not in ai_value and 'não foram encontrados' not in ai_value:
-                    final_results[key] = ai_value
-                elif trad_value and 'não foi encontrado' not in trad_value and 'não foram encontrados' not in trad_value:
-                    final_results[key] = trad_value
-                else:
-                    # Usa o valor da IA como fallback (mesmo que seja mensagem de erro)
-                    final_results[key] = ai_value if ai_value else trad_value
-            
-            return final_results
-        except Exception as e:
-            print(f"⚠ Erro ao usar IA, usando método tradicional: {e}")
-            # Fallback para método tradicional
-            nlp = NLPService()
-            return nlp.extract_info(text)
-    else:
-        # Usa apenas método tradicional
-        nlp = NLPService()
-        return nlp.extract_info(text)
\ No newline at end of file
+    from .extraction_engine import get_engine
+    return get_engine().extract(text, use_ai=use_ai)
\ No newline at end of file
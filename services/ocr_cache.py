@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR results, addressed by file content and OCR settings.
+
+    Each entry is a text file named after the SHA-256 of the uploaded bytes
+    combined with the settings that affect the OCR output (language, DPI,
+    Tesseract version, ...). The cache is bounded in bytes and evicts the least
+    recently used entries first.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=200 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory for cache entries (default: 'ocr_cache' in the package root)
+            max_bytes: Maximum total size of the cached texts
+        """
+        base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ocr_cache")
+        self.cache_dir = cache_dir or base_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_entries()
+
+    @staticmethod
+    def file_digest(file_path, chunk_size=1024 * 1024):
+        """
+        Compute the SHA-256 of a file without loading it fully in memory.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def make_key(self, file_path, settings, file_digest=None):
+        """
+        Build the cache key for a file and a set of OCR settings.
+
+        Args:
+            file_path: Path to the file
+            settings: Dictionary of settings that change the OCR output
+            file_digest: SHA-256 of the file, if already known
+
+        Returns:
+            str: Cache key
+        """
+        file_digest = file_digest or self.file_digest(file_path)
+        payload = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f"{file_digest}:{payload}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached text for a key.
+
+        Args:
+            key: Cache key from ``make_key``
+
+        Returns:
+            str or None if the key is not cached
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8", newline="") as f:
+                    text = f.read()
+            except OSError:
+                # Missing or evicted (possibly by another process)
+                self._forget(key)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Written by another process sharing the cache directory
+                self._entries[key] = len(text.encode("utf-8"))
+                self._total_bytes += self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def set(self, key, text):
+        """
+        Store the text for a key, evicting old entries if the cache is full.
+
+        Args:
+            key: Cache key from ``make_key``
+            text: OCR output to cache
+        """
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing OCR cache entry: {e}")
+            return
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        Returns:
+            dict: hits, misses, entries and bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self):
+        """Remove every cache entry."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove_file(key)
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _load_entries(self):
+        """Index existing entries, oldest access first."""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".txt"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _forget(self, key):
+        """Drop a key from the in-memory index. Caller holds the lock."""
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Remove least recently used entries until under ``max_bytes``. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._remove_file(key)
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -1,50 +1,337 @@
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import multiprocessing
 import os
+import subprocess
+import threading
+import time
+
+from .tesseract_backend import create_backend
+from .metrics_service import (
+    CACHE_HITS_TOTAL,
+    CACHE_MISSES_TOTAL,
+    OCR_EARLY_EXITS_TOTAL,
+    OCR_RERUNS_TOTAL,
+    PAGES_TOTAL,
+    PDF_PAGES_TOTAL,
+    observe_stage,
+    timed,
+)
+
+
+def _pool_context():
+    """
+    Start method of the PDF worker processes.
+    
+    The web app runs job, spreadsheet and model-loading threads, and forking
+    while one of them holds a lock can deadlock the child, so workers are
+    started by a forkserver (or spawned where forkserver is not available,
+    e.g. on Windows) instead of being forked from the server.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _init_pdf_worker():
+    """Pool initializer for PDF OCR worker processes."""
+    # Pages are already parallelized across processes; keep each Tesseract
+    # run single-threaded to avoid oversubscribing the cores
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+# Backends used by this process, by (name, language, tesseract_cmd). PDF worker
+# processes create their own on first use, with a single API handle each.
+_backends = {}
+
+
+def _get_backend(name, language, tesseract_cmd):
+    key = (name, language, tesseract_cmd)
+    backend = _backends.get(key)
+    if backend is None:
+        backend = _backends[key] = create_backend(name, language, tesseract_cmd, max_handles=1)
+    return backend
+
+
+def _ocr_pdf_window(pdf_path, first_page, last_page, dpi, language, tesseract_cmd, adaptive=None,
+                    backend_name="pytesseract"):
+    """
+    Rasterize and OCR a small window of PDF pages.
+
+    Runs inside a worker process, so only this window is ever held in memory.
+
+    Args:
+        adaptive: None, or (fast DPI, fast Tesseract config, minimum confidence).
+            Pages are then read at the fast DPI first and only pages below the
+            minimum confidence are rasterized again at ``dpi`` and re-read.
+        backend_name: OCR backend used by the worker ("pytesseract" or "tesserocr")
+
+    Returns:
+        tuple: (texts, rasterization seconds, Tesseract seconds per page,
+        pages re-read). Timings are returned instead of recorded because
+        metrics live in the parent process.
+    """
+    from pdf2image import convert_from_path
+
+    backend = _get_backend(backend_name, language, tesseract_cmd)
+    start = time.perf_counter()
+    pages = convert_from_path(
+        pdf_path, dpi=adaptive[0] if adaptive else dpi, first_page=first_page, last_page=last_page
+    )
+    raster_seconds = time.perf_counter() - start
+    texts = []
+    ocr_seconds = []
+    reruns = 0
+    try:
+        for page_number, page in enumerate(pages, start=first_page):
+            start = time.perf_counter()
+            if adaptive is None:
+                texts.append(backend.image_to_string(page))
+            else:
+                _, fast_config, min_confidence = adaptive
+                text, confidence = backend.image_to_text_and_confidence(page, fast_config)
+                if confidence < min_confidence:
+                    reruns += 1
+                    full_pages = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+                    try:
+                        text = backend.image_to_string(full_pages[0])
+                    finally:
+                        for full_page in full_pages:
+                            full_page.close()
+                texts.append(text)
+            ocr_seconds.append(time.perf_counter() - start)
+    finally:
+        for page in pages:
+            page.close()
+    return texts, raster_seconds, ocr_seconds, reruns
+
+
+def _record_window(window_result):
+    """Record the metrics of a PDF window and return its page texts."""
+    texts, raster_seconds, ocr_seconds, reruns = window_result
+    observe_stage("rasterization", raster_seconds)
+    for seconds in ocr_seconds:
+        observe_stage("tesseract_page", seconds)
+    PAGES_TOTAL.inc(len(texts))
+    if reruns:
+        OCR_RERUNS_TOTAL.inc(reruns, reason="low_confidence")
+    return texts
 
 
 class OCRService:
     """Service for extracting text from images and PDFs using Tesseract OCR."""
     
-    def __init__(self, tesseract_cmd=None, language="por"):
+    def __init__(self, tesseract_cmd=None, language="por", pdf_workers=None, pages_per_task=2,
+                 dpi=300, cache=None, preprocessor=None, adaptive=False, fast_dpi=150,
+                 fast_config="-c tessedit_do_invert=0", min_confidence=70, backend="auto",
+                 text_layer=True, text_layer_min_chars=40, pdftotext_cmd="pdftotext"):
         """
         Initialize OCR service.
         
         Args:
             tesseract_cmd: Path to Tesseract executable. If None, uses default.
             language: Language for OCR (default: 'por' for Portuguese)
+            pdf_workers: Processes used to OCR PDF pages (default: number of
+                cores). The pool is shared by every PDF this service reads, so
+                concurrent uploads, jobs and batches never use more processes
+                than this
+            pages_per_task: Pages rasterized at once by each worker
+            dpi: DPI used to rasterize PDF pages (default: 300)
+            cache: Optional OCRCache; repeated files skip rasterization and OCR
+            preprocessor: Optional ImagePreprocessor applied to images before OCR
+            adaptive: If True, reads each page at ``fast_dpi`` first and only
+                re-reads at ``dpi`` what has low confidence or missing fields
+            fast_dpi: DPI of the fast pass in adaptive mode
+            fast_config: Tesseract options of the fast pass in adaptive mode
+            min_confidence: Mean word confidence (0-100) a fast-pass page needs
+            backend: "tesserocr" (in-process API handles, language data loaded
+                once), "pytesseract" (one tesseract process per image) or
+                "auto" (tesserocr when installed, otherwise pytesseract)
+            text_layer: If True, PDF pages with an embedded text layer are read
+                from it instead of being rasterized and OCR'd
+            text_layer_min_chars: Letters and digits a page's text layer needs
+                to be used
+            pdftotext_cmd: Path to poppler's ``pdftotext`` executable
         """
-        if tesseract_cmd:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-        else:
-            # Use macOS Homebrew path by default
-            pytesseract.pytesseract.tesseract_cmd = "C:/desenvolvimento/Tesseract-OCR/tesseract.exe"
+        # Use macOS Homebrew path by default
+        self.tesseract_cmd = tesseract_cmd or "C:/desenvolvimento/Tesseract-OCR/tesseract.exe"
+        self.backend_name = backend
         self.language = language
+        self.pdf_workers = pdf_workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self.dpi = dpi
+        self.cache = cache
+        self.preprocessor = preprocessor
+        self.adaptive = adaptive
+        self.fast_dpi = fast_dpi
+        self.fast_config = fast_config
+        self.min_confidence = min_confidence
+        self.text_layer = text_layer
+        self.text_layer_min_chars = text_layer_min_chars
+        self.pdftotext_cmd = pdftotext_cmd
+        self._fast_preprocessor = None
+        self._tesseract_version = None
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        atexit.register(self.close)
+    
+    @property
+    def backend(self):
+        """OCR backend, created (and its libraries imported) on first use."""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    backend = create_backend(self.backend_name, self.language, self.tesseract_cmd)
+                    # In-process PDF windows (a single worker) share this backend
+                    _backends.setdefault((backend.name, self.language, self.tesseract_cmd), backend)
+                    self._backend = backend
+        return self._backend
+    
+    def close(self):
+        """Shut down the PDF worker pool (a new one is started if needed)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
     
-    def extract_text(self, file_path):
+    def _get_pool(self):
+        """PDF worker pool, started on first use and reused afterwards."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.pdf_workers, mp_context=_pool_context(), initializer=_init_pdf_worker
+                )
+            return self._pool
+    
+    def _discard_pool(self, pool):
+        """Forget a broken pool so the next PDF starts a fresh one."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    def extract_text(self, file_path, file_digest=None, stop_when=None, is_complete=None, page_sources=None):
         """
         Extract text from an image or PDF file.
         
+        When a cache is configured, the result is looked up by the file's
+        SHA-256 and the OCR settings before running Tesseract. Empty results
+        are not cached, so a transient failure (wrong Tesseract path, blank
+        render) is retried on the next request.
+        
         Args:
             file_path: Path to the file (PDF, JPG, PNG, etc.)
+            file_digest: SHA-256 of the file, if already known
+            stop_when: Optional callable receiving the text read so far after
+                each PDF page; OCR stops as soon as it returns True
+            is_complete: Optional callable telling whether a text has every
+                field needed (defaults to ``stop_when``). In adaptive mode, a
+                fast-pass text that fails it is read again at full DPI
+            page_sources: Optional list that receives how each page was read:
+                "text_layer", "ocr", or a single "cache" entry on a cache hit
             
         Returns:
             str: Extracted text
         """
-        text = ""
-        ext = os.path.splitext(file_path)[1].lower()
+        incremental = stop_when is not None and self._is_pdf(file_path)
+        is_complete = is_complete or stop_when
+        if not incremental:
+            stop_when = None
+        if page_sources is None:
+            page_sources = []
+        if self.cache is None:
+            return self._extract_text_uncached(file_path, stop_when, is_complete, page_sources)
         
-        if ext == ".pdf":
-            pages = convert_from_path(file_path, dpi=300)
-            for page in pages:
-                text += pytesseract.image_to_string(page, lang=self.language)
-        else:
-            img = Image.open(file_path)
-            text = pytesseract.image_to_string(img, lang=self.language)
+        # Text read with early exit may be partial: cached separately from full reads
+        settings = dict(self.cache_settings(), mode="early_exit" if incremental else "full")
+        key = self.cache.make_key(file_path, settings, file_digest=file_digest)
+        text = self.cache.get(key)
+        if text is not None:
+            CACHE_HITS_TOTAL.inc(cache="ocr")
+            page_sources.append("cache")
+            return text
         
+        CACHE_MISSES_TOTAL.inc(cache="ocr")
+        text = self._extract_text_uncached(file_path, stop_when, is_complete, page_sources)
+        if text and text.strip():
+            self.cache.set(key, text)
         return text
     
+    def cache_settings(self):
+        """
+        Settings that change the OCR output and therefore the cache key.
+        
+        Returns:
+            dict: Language, DPI, Tesseract version, image preprocessing and
+            adaptive mode
+        """
+        return {
+            "language": self.language,
+            "dpi": self.dpi,
+            "tesseract": self.tesseract_version(),
+            "backend": self.backend.name,
+            "preprocessing": self.preprocessor.settings() if self.preprocessor else None,
+            "adaptive": self._adaptive_settings(),
+            "text_layer": self.text_layer_min_chars if self.text_layer else None,
+        }
+    
+    def tesseract_version(self):
+        """Return the Tesseract version string (queried once)."""
+        if self._tesseract_version is None:
+            self._tesseract_version = self.backend.version()
+        return self._tesseract_version
+    
+    def _extract_text_uncached(self, file_path, stop_when=None, is_complete=None, page_sources=None):
+        if page_sources is None:
+            page_sources = []
+        if not self.adaptive:
+            return self._read(file_path, stop_when, page_sources=page_sources)
+        
+        # Fast pass: low DPI, confidence-checked; low-confidence PDF pages are
+        # already re-read at full DPI inside the pass
+        if self._is_pdf(file_path):
+            text = self._read(file_path, stop_when, adaptive=True, page_sources=page_sources)
+        else:
+            text, confidence = self.extract_text_from_image_fast(file_path)
+            page_sources.append("ocr")
+            if confidence < self.min_confidence:
+                OCR_RERUNS_TOTAL.inc(reason="low_confidence")
+                return self.extract_text_from_image(file_path)
+        
+        if is_complete is None or is_complete(text):
+            return text
+        OCR_RERUNS_TOTAL.inc(reason="missing_fields")
+        del page_sources[:]
+        return self._read(file_path, stop_when, page_sources=page_sources)
+    
+    def _read(self, file_path, stop_when=None, adaptive=False, page_sources=None):
+        if self._is_pdf(file_path):
+            if stop_when is not None:
+                return self.extract_text_from_pdf_until(
+                    file_path, stop_when, dpi=self.dpi, adaptive=adaptive, sources=page_sources
+                )
+            return self.extract_text_from_pdf(file_path, dpi=self.dpi, adaptive=adaptive, sources=page_sources)
+        if page_sources is not None:
+            page_sources.append("ocr")
+        return self.extract_text_from_image(file_path)
+    
+    def _adaptive_settings(self):
+        if not self.adaptive:
+            return None
+        return {
+            "fast_dpi": self.fast_dpi,
+            "fast_config": self.fast_config,
+            "min_confidence": self.min_confidence,
+        }
+    
+    @staticmethod
+    def _is_pdf(file_path):
+        return os.path.splitext(file_path)[1].lower() == ".pdf"
+    
     def extract_text_from_image(self, image_path):
         """
         Extract text from an image file.
@@ -55,25 +342,231 @@ class OCRService:
         Returns:
             str: Extracted text
         """
-        img = Image.open(image_path)
-        return pytesseract.image_to_string(img, lang=self.language)
+        from PIL import Image
+        
+        with Image.open(image_path) as img:
+            if self.preprocessor is not None:
+                img = self.preprocessor.prepare(img)
+            with timed("tesseract_page"):
+                text = self.backend.image_to_string(img)
+        PAGES_TOTAL.inc()
+        return text
+    
+    def extract_text_from_image_fast(self, image_path):
+        """
+        Fast pass over an image: downscaled to ``fast_dpi`` and read with ``fast_config``.
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            tuple: (text, mean word confidence from 0 to 100)
+        """
+        from PIL import Image
+        
+        with Image.open(image_path) as img:
+            img = self._get_fast_preprocessor().prepare(img)
+            with timed("tesseract_page"):
+                result = self.backend.image_to_text_and_confidence(img, self.fast_config)
+        PAGES_TOTAL.inc()
+        return result
+    
+    def _get_fast_preprocessor(self):
+        if self._fast_preprocessor is None:
+            from .image_preprocessing import ImagePreprocessor
+            
+            # Same steps as the regular preprocessing (if any), at the fast DPI
+            settings = self.preprocessor.settings() if self.preprocessor else {
+                "grayscale": False, "binarize": False, "crop_borders": False,
+            }
+            self._fast_preprocessor = ImagePreprocessor(**dict(settings, target_dpi=self.fast_dpi))
+        return self._fast_preprocessor
     
-    def extract_text_from_pdf(self, pdf_path, dpi=300):
+    def extract_text_from_pdf(self, pdf_path, dpi=300, adaptive=False, sources=None):
         """
         Extract text from a PDF file.
         
         Args:
             pdf_path: Path to the PDF file
             dpi: DPI for PDF conversion (default: 300)
+            adaptive: If True, reads pages at the fast DPI first (see ``iter_pdf_pages``)
+            sources: Optional list that receives the source of each page
             
         Returns:
             str: Extracted text from all pages
         """
-        pages = convert_from_path(pdf_path, dpi=dpi)
+        return "".join(self.iter_pdf_pages(pdf_path, dpi=dpi, adaptive=adaptive, sources=sources))
+    
+    def extract_text_from_pdf_until(self, pdf_path, stop_when, dpi=300, adaptive=False, sources=None):
+        """
+        Extract text from a PDF page by page, stopping once ``stop_when`` is satisfied.
+        
+        The first page is read on its own before any worker process is
+        started, so documents whose information is on page one cost a single
+        page of OCR.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            stop_when: Callable receiving the text read so far; True stops OCR
+            dpi: DPI for PDF conversion (default: 300)
+            adaptive: If True, reads pages at the fast DPI first (see ``iter_pdf_pages``)
+            sources: Optional list that receives the source of each page read
+            
+        Returns:
+            str: Text of the pages read
+        """
         text = ""
-        for page in pages:
-            text += pytesseract.image_to_string(page, lang=self.language)
+        pages = self.iter_pdf_pages(pdf_path, dpi=dpi, lead_pages=1, adaptive=adaptive, sources=sources)
+        try:
+            for page_text in pages:
+                text += page_text
+                if stop_when(text):
+                    OCR_EARLY_EXITS_TOTAL.inc()
+                    break
+        finally:
+            pages.close()
         return text
+    
+    def iter_pdf_pages(self, pdf_path, dpi=300, lead_pages=0, adaptive=False, sources=None):
+        """
+        Yield the text of each PDF page, in page order.
+        
+        Pages with a usable embedded text layer (digitally generated PDFs) are
+        read directly from it. The remaining pages are rasterized in windows of
+        ``pages_per_task`` pages by the service's pool of ``pdf_workers``
+        processes. Each PDF keeps at most one window per worker in flight, so
+        peak memory does not depend on the page count; windows of concurrent
+        PDFs queue for the same workers. Closing the generator early cancels
+        the windows not yet started.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            dpi: DPI for PDF conversion (default: 300)
+            lead_pages: Pages OCR'd in this process, one window, before the
+                pool is started (useful when the caller may stop early)
+            adaptive: If True, pages are rasterized at ``fast_dpi`` and read
+                with ``fast_config``; pages whose mean word confidence is below
+                ``min_confidence`` are rasterized again at ``dpi`` and re-read
+            sources: Optional list that receives the source of each page
+                yielded ("text_layer" or "ocr")
+            
+        Yields:
+            str: Text of each page
+        """
+        from pdf2image import pdfinfo_from_path
+        
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        text_layer = self.read_text_layer(pdf_path, page_count)
+        ocr_pages = [number for number in range(1, page_count + 1) if number not in text_layer]
+        ocr_texts = self._iter_ocr_windows(
+            pdf_path, self._plan_windows(ocr_pages, lead_pages), dpi, adaptive, lead=bool(lead_pages)
+        )
+        try:
+            for number in range(1, page_count + 1):
+                if number in text_layer:
+                    source, text = "text_layer", text_layer[number]
+                else:
+                    source, text = "ocr", next(ocr_texts)
+                PDF_PAGES_TOTAL.inc(source=source)
+                if sources is not None:
+                    sources.append(source)
+                yield text
+        finally:
+            ocr_texts.close()
+    
+    def read_text_layer(self, pdf_path, page_count):
+        """
+        Read the embedded text layer of a PDF with poppler's ``pdftotext``.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            page_count: Number of pages in the PDF
+            
+        Returns:
+            dict: Page number to text, only for pages with at least
+            ``text_layer_min_chars`` letters or digits (empty when the text
+            layer is disabled or ``pdftotext`` is not available)
+        """
+        if not self.text_layer:
+            return {}
+        with timed("text_layer"):
+            try:
+                result = subprocess.run(
+                    [self.pdftotext_cmd, "-enc", "UTF-8", pdf_path, "-"],
+                    capture_output=True,
+                    check=True,
+                    timeout=60,
+                )
+            except (OSError, subprocess.SubprocessError):
+                return {}
+        # pdftotext ends every page with a form feed
+        pages = result.stdout.decode("utf-8", errors="replace").split("\f")[:page_count]
+        return {
+            number: text
+            for number, text in enumerate(pages, start=1)
+            if sum(1 for char in text if char.isalnum()) >= self.text_layer_min_chars
+        }
+    
+    def _plan_windows(self, pages, lead_pages=0):
+        """Group page numbers into (first, last) windows of consecutive pages."""
+        windows = []
+        for number in pages:
+            limit = lead_pages if lead_pages and len(windows) == 1 else self.pages_per_task
+            if windows and number == windows[-1][1] + 1 and windows[-1][1] - windows[-1][0] + 1 < limit:
+                windows[-1][1] = number
+            else:
+                windows.append([number, number])
+        return [tuple(window) for window in windows]
+    
+    def _iter_ocr_windows(self, pdf_path, windows, dpi, adaptive, lead=False):
+        """Yield the OCR text of every page in ``windows``, in order (see ``iter_pdf_pages``)."""
+        tesseract_cmd = self.tesseract_cmd
+        window_options = (self.fast_dpi, self.fast_config, self.min_confidence) if adaptive else None
+        if lead and windows:
+            first, last = windows[0]
+            yield from _record_window(
+                _ocr_pdf_window(
+                    pdf_path, first, last, dpi, self.language, tesseract_cmd, window_options, self.backend.name
+                )
+            )
+            windows = windows[1:]
+        
+        workers = min(self.pdf_workers, len(windows))
+        if workers <= 1:
+            for first, last in windows:
+                yield from _record_window(
+                    _ocr_pdf_window(
+                        pdf_path, first, last, dpi, self.language, tesseract_cmd, window_options, self.backend.name
+                    )
+                )
+            return
+        
+        pool = self._get_pool()
+        remaining = iter(windows)
+        in_flight = deque()
+        
+        def submit_next():
+            window = next(remaining, None)
+            if window is not None:
+                in_flight.append(pool.submit(
+                    _ocr_pdf_window, pdf_path, window[0], window[1], dpi, self.language, tesseract_cmd,
+                    window_options, self.backend.name,
+                ))
+        
+        try:
+            for _ in range(workers):
+                submit_next()
+            while in_flight:
+                texts = _record_window(in_flight.popleft().result())
+                submit_next()
+                yield from texts
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+        finally:
+            # Windows already running finish in the background; their results are dropped
+            for future in in_flight:
+                future.cancel()
 
 
 # Legacy function for backward compatibility
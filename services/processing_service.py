@@ -0,0 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .excel_service import BufferedExcelWriter
+from .extraction_engine import FIELDS, is_found
+from .metrics_service import timed
+
+
+class EmptyTextError(ValueError):
+    """Raised when OCR returns no usable text for a file."""
+
+
+class CertificateProcessor:
+    """Runs the OCR → extraction → spreadsheet pipeline for a saved upload."""
+
+    def __init__(self, ocr_service, engine, excel_service, force_full_ocr=False, result_store=None):
+        """
+        Initialize the processor.
+
+        Args:
+            ocr_service: OCRService used to read the file
+            engine: Shared ExtractionEngine
+            excel_service: ExcelService (or BufferedExcelWriter) that stores the row
+            force_full_ocr: If True, always OCRs every PDF page instead of
+                stopping once all fields are found
+            result_store: Optional ProcessedResultStore; files whose digest
+                was already processed and saved are answered from it, without
+                OCR, extraction or a new spreadsheet row
+        """
+        self.ocr_service = ocr_service
+        self.engine = engine
+        self.excel_service = excel_service
+        self.force_full_ocr = force_full_ocr
+        self.result_store = result_store
+
+    def process(self, file_path, save=True, file_digest=None):
+        """
+        Process a file already stored on disk.
+
+        Args:
+            file_path: Path to the saved upload
+            save: If True, appends the extracted row to the spreadsheet
+            file_digest: SHA-256 of the file, if already known (skips re-hashing)
+
+        Returns:
+            dict: ``data`` (extracted fields), ``found_count``,
+            ``page_sources`` (how each page was read: "text_layer", "ocr" or
+            "cache") and ``reused`` (True when the file had already been
+            processed and saved, and the earlier result is returned)
+
+        Raises:
+            EmptyTextError: If OCR could not read any text
+        """
+        with timed("process"):
+            return self._process(file_path, save, file_digest)
+
+    def process_many(self, file_paths, max_workers=4, save=True, file_digests=None):
+        """
+        Process several files stored on disk in one go.
+
+        OCR runs concurrently on a thread pool (Tesseract runs in its own
+        process, so threads overlap well), extraction runs as a single batch on
+        the shared engine and all rows are stored with one spreadsheet update.
+
+        Args:
+            file_paths: Paths to the saved uploads
+            max_workers: Maximum number of files read by OCR at the same time
+            save: If True, appends the extracted rows to the spreadsheet
+            file_digests: SHA-256 of each file, in the same order, if already known
+
+        Returns:
+            list: One dict per file, in order: ``data``, ``found_count``,
+            ``page_sources`` and ``reused`` (see ``process``), or
+            ``error`` if the file could not be processed. A file repeated
+            within the batch is processed once and saved once.
+        """
+        if not file_paths:
+            return []
+        if file_digests is None:
+            file_digests = [None] * len(file_paths)
+
+        with timed("batch"):
+            outcomes = [None] * len(file_paths)
+            pending = {}
+            repeats = {}
+            for index, (path, digest) in enumerate(zip(file_paths, file_digests)):
+                reused = self._reused_outcome(digest) if save else None
+                if reused is not None:
+                    outcomes[index] = reused
+                elif digest is not None and digest in repeats:
+                    repeats[digest].append(index)
+                else:
+                    pending[index] = (path, digest)
+                    if digest is not None:
+                        repeats[digest] = []
+
+            futures = {}
+            if pending:
+                workers = max(1, min(max_workers, len(pending)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-ocr") as pool:
+                    futures = {
+                        index: pool.submit(self._read_text, path, digest)
+                        for index, (path, digest) in pending.items()
+                    }
+
+            texts = {}
+            page_sources = {}
+            for index, future in futures.items():
+                try:
+                    texts[index], page_sources[index] = future.result()
+                except Exception as exc:
+                    outcomes[index] = {"error": str(exc)}
+
+            if texts:
+                rows = self.engine.extract_many(list(texts.values()), use_ai=True)
+                for index, data in zip(texts, rows):
+                    outcomes[index] = {
+                        "data": data,
+                        "found_count": self._found_count(data),
+                        "page_sources": page_sources[index],
+                        "reused": False,
+                    }
+
+                # Uma única atualização da planilha para todo o lote
+                if save:
+                    self._save_rows(rows, [(file_digests[index], outcomes[index]) for index in texts])
+
+            for index, (_, digest) in pending.items():
+                for repeat in repeats.get(digest, ()):
+                    outcome = outcomes[index]
+                    outcomes[repeat] = outcome if "error" in outcome else dict(outcome, reused=True)
+
+        return outcomes
+
+    def _process(self, file_path, save, file_digest):
+        reused = self._reused_outcome(file_digest) if save else None
+        if reused is not None:
+            return reused
+
+        text, page_sources = self._read_text(file_path, file_digest)
+
+        # Tenta usar IA primeiro, com fallback para método tradicional
+        data = self.engine.extract(text, use_ai=True)
+
+        outcome = {
+            "data": data,
+            "found_count": self._found_count(data),
+            "page_sources": page_sources,
+            "reused": False,
+        }
+
+        # Salva no Excel mesmo se alguns campos não foram encontrados
+        if save:
+            self._save_rows([data], [(file_digest, outcome)])
+
+        return outcome
+
+    def _save_rows(self, rows, results):
+        """
+        Append rows to the spreadsheet and record their results as processed.
+
+        A result is only recorded once its row is on disk: with a
+        BufferedExcelWriter, after the flush that writes it. A row lost
+        before the flush is therefore written again when the file is re-sent.
+        """
+        def remember():
+            for file_digest, outcome in results:
+                self._remember(file_digest, outcome)
+
+        if isinstance(self.excel_service, BufferedExcelWriter):
+            self.excel_service.save_rows(rows, on_saved=remember)
+        else:
+            self.excel_service.save_rows(rows)
+            remember()
+
+    def _reused_outcome(self, file_digest):
+        """Earlier result of an upload already processed and saved, or None."""
+        if self.result_store is None or file_digest is None:
+            return None
+        stored = self.result_store.get(file_digest)
+        if stored is None:
+            return None
+        return dict(stored, reused=True)
+
+    def _remember(self, file_digest, outcome):
+        if self.result_store is not None and file_digest is not None:
+            self.result_store.set(file_digest, outcome)
+
+    def _read_text(self, file_path, file_digest=None):
+        page_sources = []
+        with timed("ocr"):
+            text = self.ocr_service.extract_text(
+                file_path,
+                file_digest=file_digest,
+                stop_when=None if self.force_full_ocr else self.fields_complete,
+                is_complete=self.fields_complete,
+                page_sources=page_sources,
+            )
+
+        if not text or not text.strip():
+            raise EmptyTextError(
+                "O OCR não conseguiu extrair texto da imagem. "
+                "Verifique se a imagem está legível e em boa qualidade."
+            )
+        return text, page_sources
+
+    def fields_complete(self, text):
+        """
+        Check whether every field can already be extracted from ``text``.
+
+        Uses the regex extractor only, which is cheap enough to run after each
+        OCR page.
+
+        Args:
+            text: Text read so far
+
+        Returns:
+            bool: True if CID, doctor, emission date and rest days were all found
+        """
+        fields = self.engine.nlp_service.extract_fields(text)
+        return all(fields[key] for key in ("cid", "doctor", "date", "days"))
+
+    @staticmethod
+    def _found_count(data):
+        return sum(1 for key in FIELDS if is_found(data.get(key, "")))
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+
+
+class ProcessedResultStore:
+    """
+    Results of the uploads already processed and saved to the spreadsheet.
+
+    Each entry is a JSON file named after the SHA-256 of the uploaded bytes,
+    stored next to the upload itself (``<sha256>.json``). A file sent again is
+    answered from its entry, so it is neither extracted again nor appended to
+    the spreadsheet a second time.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory of the entries (default: 'uploads' in the package root)
+        """
+        base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+        self.directory = directory or base_dir
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, sha256):
+        """
+        Look up the result of a processed upload.
+
+        Args:
+            sha256: SHA-256 of the uploaded file
+
+        Returns:
+            dict or None: ``data``, ``found_count`` and ``page_sources`` of the
+            first processing, or None if the file was never processed
+        """
+        try:
+            with open(self._path(sha256), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, sha256, outcome):
+        """
+        Record the result of a processed upload.
+
+        Args:
+            sha256: SHA-256 of the uploaded file
+            outcome: ``data``, ``found_count`` and ``page_sources`` as returned
+                by ``CertificateProcessor.process``
+        """
+        entry = {key: outcome[key] for key in ("data", "found_count", "page_sources")}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".result-", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(sha256))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _path(self, sha256):
+        return os.path.join(self.directory, f"{sha256}.json")
@@ -0,0 +1,129 @@
+"""
+Índice de similaridade sublinear (MinHash + LSH) para o histórico de correções.
+
+Cada texto é representado pelo conjunto de suas palavras. A assinatura MinHash é
+calculada com "one permutation hashing" (um único hash por palavra, distribuído
+em `num_perm` compartimentos, com densificação dos compartimentos vazios), o que
+mantém o custo linear no número de palavras. As assinaturas são divididas em
+bandas (LSH) e apenas textos que colidem em pelo menos uma banda são retornados
+como candidatos.
+"""
+
+import hashlib
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Set
+
+
+_MAX_HASH = (1 << 64) - 1
+_EMPTY = _MAX_HASH
+
+
+def _token_hash(token: str) -> int:
+    """Hash estável de 64 bits para uma palavra."""
+    digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class MinHashLSHIndex:
+    """
+    Índice LSH sobre assinaturas MinHash.
+
+    Com os valores padrão (32 bandas de 4 linhas), um par com similaridade de
+    Jaccard 0,70 vira candidato com probabilidade superior a 99,9%, enquanto
+    pares com Jaccard abaixo de 0,30 raramente colidem.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32):
+        """
+        Inicializa o índice vazio.
+
+        Args:
+            num_perm: Tamanho da assinatura MinHash
+            bands: Número de bandas LSH (deve dividir `num_perm`)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[tuple, List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def signature(self, tokens: Iterable[str]) -> List[int]:
+        """
+        Calcula a assinatura MinHash de um conjunto de palavras.
+
+        Args:
+            tokens: Palavras do texto
+
+        Returns:
+            Lista com `num_perm` valores
+        """
+        k = self.num_perm
+        sig = [_EMPTY] * k
+        for token in tokens:
+            h = _token_hash(token)
+            slot = h % k
+            value = h // k
+            if value < sig[slot]:
+                sig[slot] = value
+
+        # Densificação: compartimentos vazios copiam o próximo compartimento
+        # preenchido (circularmente), deslocado pela distância percorrida
+        if _EMPTY in sig and any(v != _EMPTY for v in sig):
+            filled = sig[:]
+            for i in range(k):
+                if filled[i] != _EMPTY:
+                    continue
+                distance = 1
+                while filled[(i + distance) % k] == _EMPTY:
+                    distance += 1
+                sig[i] = filled[(i + distance) % k] + distance * (_MAX_HASH // k)
+        return sig
+
+    def _band_keys(self, sig: List[int]):
+        r = self.rows
+        for band in range(self.bands):
+            yield band, tuple(sig[band * r:(band + 1) * r])
+
+    def add(self, key: Hashable, tokens: Set[str]) -> None:
+        """
+        Adiciona um texto ao índice.
+
+        Args:
+            key: Identificador do texto (ex.: posição no histórico)
+            tokens: Conjunto de palavras do texto
+        """
+        if not tokens:
+            return
+        for band, band_key in self._band_keys(self.signature(tokens)):
+            self._buckets[band][band_key].append(key)
+        self._size += 1
+
+    def query(self, tokens: Set[str]) -> Set[Hashable]:
+        """
+        Retorna os identificadores candidatos a alta similaridade.
+
+        Args:
+            tokens: Conjunto de palavras do texto consultado
+
+        Returns:
+            Conjunto de identificadores que colidem em pelo menos uma banda
+        """
+        candidates = set()
+        if not tokens or not self._size:
+            return candidates
+        for band, band_key in self._band_keys(self.signature(tokens)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                candidates.update(bucket)
+        return candidates
+
+    def clear(self) -> None:
+        """Remove todos os textos do índice."""
+        for bucket in self._buckets:
+            bucket.clear()
+        self._size = 0
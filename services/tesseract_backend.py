@@ -0,0 +1,267 @@
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+
+
+def _import_tesserocr():
+    """Import tesserocr on first use; returns None when it is not installed."""
+    try:
+        import tesserocr
+    except ImportError:  # tesserocr is optional; pytesseract is the fallback
+        return None
+    return tesserocr
+
+
+def parse_config(config):
+    """
+    Extract ``-c name=value`` variables from a Tesseract command-line config.
+
+    Args:
+        config: Config string as passed to pytesseract (e.g. "-c tessedit_do_invert=0")
+
+    Returns:
+        dict: Variable names and values
+    """
+    variables = {}
+    tokens = shlex.split(config or "")
+    for index, token in enumerate(tokens):
+        if token == "-c" and index + 1 < len(tokens) and "=" in tokens[index + 1]:
+            name, value = tokens[index + 1].split("=", 1)
+            variables[name] = value
+    return variables
+
+
+class PytesseractBackend:
+    """Runs the ``tesseract`` executable once per image (through pytesseract)."""
+
+    name = "pytesseract"
+
+    def __init__(self, language="por", tesseract_cmd=None):
+        import pytesseract
+
+        self.language = language
+        self._pytesseract = pytesseract
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    def version(self):
+        """Return the Tesseract version string."""
+        return str(self._pytesseract.get_tesseract_version())
+
+    def image_to_string(self, image, config=""):
+        """
+        OCR an image.
+
+        Args:
+            image: PIL image
+            config: Extra Tesseract options
+
+        Returns:
+            str: Recognized text
+        """
+        return self._pytesseract.image_to_string(image, lang=self.language, config=config)
+
+    def image_to_text_and_confidence(self, image, config=""):
+        """
+        OCR an image through Tesseract's TSV output.
+
+        Args:
+            image: PIL image
+            config: Extra Tesseract options
+
+        Returns:
+            tuple: (text, mean word confidence from 0 to 100). Words are joined
+            per line and paragraphs are separated by a blank line, as in
+            ``image_to_string``.
+        """
+        data = self._pytesseract.image_to_data(
+            image, lang=self.language, config=config, output_type=self._pytesseract.Output.DICT
+        )
+        paragraphs = {}
+        confidences = []
+        for index, word in enumerate(data["text"]):
+            if not word or not word.strip():
+                continue
+            paragraph = (data["block_num"][index], data["par_num"][index])
+            paragraphs.setdefault(paragraph, {}).setdefault(data["line_num"][index], []).append(word)
+            confidence = float(data["conf"][index])
+            if confidence >= 0:
+                confidences.append(confidence)
+
+        text = "\n\n".join(
+            "\n".join(" ".join(words) for words in lines.values())
+            for lines in paragraphs.values()
+        )
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return (text + "\n" if text else ""), confidence
+
+
+class TesserocrBackend:
+    """
+    Keeps in-process Tesseract API handles with the language data already loaded.
+
+    Images are passed to Tesseract in memory, without starting a process or
+    writing temporary files. Handles are created on demand, at most
+    ``max_handles``, and each is used by one thread at a time.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, language="por", tessdata_path=None, max_handles=None):
+        """
+        Initialize the backend.
+
+        Args:
+            language: Tesseract language loaded in every handle
+            tessdata_path: Directory holding the ``.traineddata`` files
+                (default: tesserocr's own default)
+            max_handles: Maximum handles alive at once (default: number of cores)
+
+        Raises:
+            ImportError: If tesserocr is not installed
+        """
+        self._tesserocr = _import_tesserocr()
+        if self._tesserocr is None:
+            raise ImportError("tesserocr não está instalado")
+        self.language = language
+        self.tessdata_path = tessdata_path
+        self.max_handles = max_handles or os.cpu_count() or 1
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+        # Loads the first handle now so a missing language fails at startup
+        with self._api():
+            pass
+
+    def version(self):
+        """Return the Tesseract version string."""
+        return self._tesserocr.tesseract_version().splitlines()[0]
+
+    def image_to_string(self, image, config=""):
+        """
+        OCR an image.
+
+        Args:
+            image: PIL image
+            config: Extra Tesseract options (only ``-c name=value`` is supported)
+
+        Returns:
+            str: Recognized text
+        """
+        with self._api(config) as api:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+
+    def image_to_text_and_confidence(self, image, config=""):
+        """
+        OCR an image and return its mean word confidence.
+
+        Args:
+            image: PIL image
+            config: Extra Tesseract options (only ``-c name=value`` is supported)
+
+        Returns:
+            tuple: (text, mean word confidence from 0 to 100)
+        """
+        with self._api(config) as api:
+            api.SetImage(image)
+            text = api.GetUTF8Text()
+            return text, float(api.MeanTextConf())
+
+    def close(self):
+        """End every idle handle."""
+        while True:
+            try:
+                api = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            api.End()
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def _api(self, config=""):
+        api = self._acquire()
+        variables = parse_config(config)
+        previous = {name: api.GetVariableAsString(name) for name in variables}
+        try:
+            for name, value in variables.items():
+                api.SetVariable(name, value)
+            yield api
+        finally:
+            for name, value in previous.items():
+                if value is not None:
+                    api.SetVariable(name, value)
+            api.Clear()
+            self._idle.put(api)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.max_handles
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            if self.tessdata_path:
+                return self._tesserocr.PyTessBaseAPI(path=self.tessdata_path, lang=self.language)
+            return self._tesserocr.PyTessBaseAPI(lang=self.language)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+
+def tessdata_path_for(tesseract_cmd):
+    """
+    Locate the ``tessdata`` directory of a Tesseract installation.
+
+    Args:
+        tesseract_cmd: Path to the Tesseract executable, if known
+
+    Returns:
+        str: Directory, or None to use the library default
+    """
+    if tesseract_cmd:
+        candidate = os.path.join(os.path.dirname(tesseract_cmd), "tessdata")
+        if os.path.isdir(candidate):
+            return candidate
+    return os.environ.get("TESSDATA_PREFIX")
+
+
+def create_backend(name="auto", language="por", tesseract_cmd=None, max_handles=None):
+    """
+    Create an OCR backend.
+
+    Args:
+        name: "tesserocr", "pytesseract" or "auto" (tesserocr when installed,
+            falling back to pytesseract)
+        language: Tesseract language
+        tesseract_cmd: Path to the Tesseract executable
+        max_handles: Maximum in-process handles (tesserocr only)
+
+    Returns:
+        PytesseractBackend or TesserocrBackend
+    """
+    tesserocr_installed = name in ("auto", "tesserocr") and _import_tesserocr() is not None
+    if tesserocr_installed:
+        try:
+            return TesserocrBackend(
+                language=language,
+                tessdata_path=tessdata_path_for(tesseract_cmd),
+                max_handles=max_handles,
+            )
+        except Exception as e:
+            if name == "tesserocr":
+                raise
+            print(f"⚠ tesserocr indisponível, usando pytesseract: {e}")
+    elif name == "tesserocr":
+        raise ImportError("tesserocr não está instalado")
+    return PytesseractBackend(language=language, tesseract_cmd=tesseract_cmd)
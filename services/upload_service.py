@@ -1,21 +1,43 @@
+import hashlib
 import os
-from werkzeug.utils import secure_filename
+import tempfile
+
+from .metrics_service import timed
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+class StoredUpload:
+    """A file stored in the upload folder under its content hash."""
+
+    def __init__(self, path, sha256, size, original_filename, duplicate):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.original_filename = original_filename
+        self.duplicate = duplicate
 
 
 class UploadService:
     """Service for handling file uploads and validation."""
     
-    def __init__(self, upload_folder=None, allowed_extensions=None):
+    def __init__(self, upload_folder=None, allowed_extensions=None, max_bytes=None, chunk_size=64 * 1024):
         """
         Initialize Upload service.
         
         Args:
             upload_folder: Directory where files will be saved (default: 'uploads')
             allowed_extensions: Set of allowed file extensions (default: pdf, png, jpg, jpeg)
+            max_bytes: Maximum size of a single upload in bytes (None for no limit)
+            chunk_size: Bytes copied to disk at a time while streaming an upload
         """
         base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
         self.upload_folder = upload_folder or base_dir
         self.allowed_extensions = allowed_extensions or {"pdf", "png", "jpg", "jpeg", "webp"}
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
         
         # Create upload folder if it doesn't exist
         os.makedirs(self.upload_folder, exist_ok=True)
@@ -45,6 +67,27 @@ class UploadService:
         Raises:
             ValueError: If file is invalid or extension not allowed
         """
+        return self.store_uploaded_file(file).path
+    
+    def store_uploaded_file(self, file):
+        """
+        Stream an uploaded file to disk, stored under its SHA-256.
+        
+        The upload is copied in chunks to a temporary file while the hash is
+        computed, then renamed to ``<sha256>.<ext>``. If a file with the same
+        content was already stored, the temporary copy is discarded and the
+        existing file is reused.
+        
+        Args:
+            file: File object from Flask request
+            
+        Returns:
+            StoredUpload: Path, hash, size and whether the content was a duplicate
+            
+        Raises:
+            ValueError: If file is invalid or extension not allowed
+            UploadTooLargeError: If the upload exceeds ``max_bytes``
+        """
         if not file or not file.filename:
             raise ValueError("Nenhum arquivo fornecido.")
         
@@ -53,11 +96,38 @@ class UploadService:
                 f"Formato de arquivo não permitido. Use: {', '.join(self.allowed_extensions)}"
             )
         
-        filename = secure_filename(file.filename)
-        path = os.path.join(self.upload_folder, filename)
-        file.save(path)
+        extension = file.filename.rsplit(".", 1)[1].lower()
+        with timed("upload_save"):
+            digest = hashlib.sha256()
+            size = 0
+            fd, temp_path = tempfile.mkstemp(dir=self.upload_folder, prefix=".upload-", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    while True:
+                        chunk = file.stream.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if self.max_bytes is not None and size > self.max_bytes:
+                            raise UploadTooLargeError(
+                                f"Arquivo muito grande. O tamanho máximo é {self.max_bytes / (1024 * 1024):.1f} MB."
+                            )
+                        digest.update(chunk)
+                        out.write(chunk)
+                
+                sha256 = digest.hexdigest()
+                path = os.path.join(self.upload_folder, f"{sha256}.{extension}")
+                duplicate = os.path.exists(path)
+                if duplicate:
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
         
-        return path
+        return StoredUpload(path, sha256, size, file.filename, duplicate)
     
     def get_file_path(self, filename):
         """
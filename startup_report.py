@@ -0,0 +1,142 @@
+"""
+Relatório do tempo de inicialização do servidor.
+
+Mede, em processos separados:
+  1. o tempo de `import app` (com `python -X importtime`), listando os módulos
+     mais lentos;
+  2. o tempo de `create_app()` até o servidor aceitar requisições;
+  3. o tempo até o modelo BERT terminar de carregar em segundo plano.
+
+Uso:
+    python startup_report.py
+    python startup_report.py --import-budget 0.5 --ready-budget 2 --top 15
+
+Com os orçamentos, o script termina com código 1 se algum tempo for excedido.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FIXTURE = os.path.join(ROOT_DIR, "ai_corrections_history.json")
+
+# Executado em um processo novo, dentro de uma pasta temporária
+STARTUP_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app_module.create_app()
+ready = time.perf_counter()
+from services.extraction_engine import get_engine
+engine = get_engine()
+engine.wait_for_model()
+model = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - start,
+    "create_app_seconds": ready - imported,
+    "model_seconds": model - imported,
+    "bert_loaded": engine.status()["bert_loaded"],
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Lê a saída de `python -X importtime`.
+
+    Returns:
+        Lista de (módulo, tempo próprio em s, tempo acumulado em s), na ordem da saída
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+
+def measure_imports():
+    """Mede `import app` em um processo novo; retorna (total em s, módulos)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    modules = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = next((cumulative for name, _, cumulative in modules if name == "app"), 0.0)
+    return total, modules
+
+
+def measure_startup():
+    """Mede `create_app()` e o carregamento do modelo em um processo novo."""
+    # O AIService e a planilha usam o diretório atual: usa uma pasta temporária
+    # para não alterar os arquivos do repositório
+    workdir = tempfile.mkdtemp(prefix="leitor_startup_")
+    try:
+        if os.path.exists(HISTORY_FIXTURE):
+            shutil.copy(HISTORY_FIXTURE, workdir)
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE.format(root=ROOT_DIR)],
+            cwd=workdir,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório do tempo de inicialização do servidor.")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de módulos mais lentos listados")
+    parser.add_argument("--import-budget", type=float, default=None, help="Tempo máximo de `import app` (s)")
+    parser.add_argument("--ready-budget", type=float, default=None,
+                        help="Tempo máximo de `import app` + `create_app()` (s)")
+    parser.add_argument("--skip-startup", action="store_true", help="Mede apenas os imports")
+    args = parser.parse_args()
+
+    over_budget = []
+
+    import_seconds, modules = measure_imports()
+    print(f"import app: {import_seconds * 1000:.0f}ms")
+    print("\nMódulos mais lentos (tempo acumulado):")
+    for name, own, cumulative in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"  {cumulative * 1000:8.1f}ms  (próprio {own * 1000:6.1f}ms)  {name}")
+    if args.import_budget is not None and import_seconds > args.import_budget:
+        over_budget.append(("import app", import_seconds, args.import_budget))
+
+    if not args.skip_startup:
+        startup = measure_startup()
+        ready_seconds = startup["import_seconds"] + startup["create_app_seconds"]
+        print(f"\ncreate_app(): {startup['create_app_seconds'] * 1000:.0f}ms")
+        print(f"Pronto para requisições após: {ready_seconds * 1000:.0f}ms")
+        model_status = "carregado" if startup["bert_loaded"] else "indisponível"
+        print(f"Modelo BERT ({model_status}) após: "
+              f"{(startup['import_seconds'] + startup['model_seconds']) * 1000:.0f}ms")
+        if args.ready_budget is not None and ready_seconds > args.ready_budget:
+            over_budget.append(("pronto para requisições", ready_seconds, args.ready_budget))
+
+    if over_budget:
+        print("\n⚠ Orçamento de inicialização excedido:")
+        for label, seconds, budget in over_budget:
+            print(f"  {label}: {seconds:.2f}s (limite {budget:.2f}s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())